@@ -0,0 +1,51 @@
+import bisect
+
+class AnimationTable():
+    """
+    An Aseprite sprite sheet export compiled into flat lists.
+    It is built once when the json is loaded and shared by every instance that uses the sprite sheet,
+    so the instances only need to hold a tag index and a time.
+    """
+    tag_index: dict[str, int]
+    tag_from: list[int]
+    tag_length: list[int]
+    # how long a loop of every tag takes, in seconds
+    tag_duration: list[float]
+    # source rectangle (x, y, w, h) of every frame in the texture
+    rects: list[tuple[float, float, float, float]]
+    # how long every frame should be shown, in seconds
+    durations: list[float]
+    # when every frame ends, counted from the start of its tag
+    frame_ends: list[float]
+
+    def __init__(self, data: dict):
+        frames = data["frames"]
+        # the json can be exported either as a list or as a dict keyed by file name
+        if isinstance(frames, dict):
+            frames = list(frames.values())
+        self.rects = [(f["frame"]["x"], f["frame"]["y"], f["frame"]["w"], f["frame"]["h"]) for f in frames]
+        self.durations = [f.get("duration", 100) / 1000 for f in frames]
+
+        tags = data["meta"].get("frameTags") or []
+        if not tags:
+            # sheets without tags get a single tag with all the frames
+            tags = [{"name": "all", "from": 0, "to": len(frames) - 1}]
+        self.tag_index = {tag["name"]: i for i, tag in enumerate(tags)}
+        self.tag_from = [tag["from"] for tag in tags]
+        self.tag_length = [tag["to"] - tag["from"] + 1 for tag in tags]
+        self.tag_duration = [sum(self.durations[tag["from"]:tag["to"] + 1]) for tag in tags]
+        self.frame_ends = [0.0] * len(frames)
+        for tag in tags:
+            end = 0.0
+            for i in range(tag["from"], tag["to"] + 1):
+                end += self.durations[i]
+                self.frame_ends[i] = end
+
+    def tag(self, name: str) -> int:
+        return self.tag_index[name]
+
+    def frame(self, tag: int, anim_time: float) -> int:
+        """ The frame of the tag to show anim_time seconds into it, the last one once the tag is over """
+        start = self.tag_from[tag]
+        return bisect.bisect_right(self.frame_ends, anim_time, start, start + self.tag_length[tag] - 1)
+
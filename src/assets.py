@@ -0,0 +1,105 @@
+import os
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, Future
+
+import pyray as pr
+
+LOAD_WORKERS = 4
+
+class LazyTextures(dict):
+    """ The texture dict of the game data. Textures that aren't uploaded yet are fetched from the assets when used """
+    assets: "Assets"
+
+    def __init__(self, assets: "Assets"):
+        super().__init__()
+        self.assets = assets
+
+    def __missing__(self, name: str) -> pr.Texture2D:
+        return self.assets.texture(name)
+
+class Assets():
+    """
+    Loads the game's files in the background.
+    Images are decoded and json files parsed on a thread pool as soon as they are requested.
+    Decoded images are turned into textures on the main thread (raylib can only create textures there),
+    either by upload_ready() once per frame, or when the texture is needed before that.
+    Lazy textures aren't read at all until something uses them.
+    """
+    res_dir: str
+    executor: ThreadPoolExecutor
+    textures: LazyTextures
+    images: dict[str, Future]
+    json_files: dict[str, Future]
+    lazy_files: dict[str, str]
+    loaded: list[pr.Texture2D]
+    start_time: float
+    # seconds from creating the assets to the end of the first frame
+    first_frame_time: float
+
+    def __init__(self, res_dir: str = "res", workers: int = LOAD_WORKERS):
+        self.res_dir = res_dir
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.textures = LazyTextures(self)
+        self.images = {}
+        self.json_files = {}
+        self.lazy_files = {}
+        self.loaded = []
+        self.start_time = time.perf_counter()
+        self.first_frame_time = None
+
+    def read_json(self, file: str):
+        with open(os.path.join(self.res_dir, file), "r") as f:
+            return json.load(f)
+
+    def load_texture(self, name: str, file: str, lazy: bool = False):
+        if lazy:
+            self.lazy_files[name] = file
+        else:
+            self.images[name] = self.executor.submit(pr.load_image, os.path.join(self.res_dir, file))
+
+    def load_json(self, name: str, file: str):
+        self.json_files[name] = self.executor.submit(self.read_json, file)
+
+    def upload(self, name: str, image: pr.Image) -> pr.Texture2D:
+        texture = pr.load_texture_from_image(image)
+        pr.unload_image(image)
+        self.loaded.append(texture)
+        self.textures[name] = texture
+        return texture
+
+    def upload_ready(self) -> int:
+        """ Create the textures of the images that finished decoding. Returns how many there were """
+        ready = [name for name, future in self.images.items() if future.done()]
+        for name in ready:
+            self.upload(name, self.images.pop(name).result())
+        return len(ready)
+
+    def texture(self, name: str) -> pr.Texture2D:
+        """ The texture, waiting for it to decode if it has to """
+        if name in self.textures:
+            return self.textures[name]
+        if name in self.lazy_files:
+            self.load_texture(name, self.lazy_files.pop(name))
+        if name not in self.images:
+            raise KeyError(name)
+        return self.upload(name, self.images.pop(name).result())
+
+    def json(self, name: str):
+        """ The parsed json file, waiting for it if it has to """
+        return self.json_files[name].result()
+
+    def first_frame(self):
+        """ Call at the end of every frame, records how long the first one took to show up """
+        if self.first_frame_time is None:
+            self.first_frame_time = time.perf_counter() - self.start_time
+
+    def unload(self):
+        self.executor.shutdown(wait=True)
+        for future in self.images.values():
+            pr.unload_image(future.result())
+        self.images.clear()
+        for texture in self.loaded:
+            pr.unload_texture(texture)
+        self.loaded.clear()
+        self.textures.clear()
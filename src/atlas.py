@@ -0,0 +1,110 @@
+"""
+Packs the small sprites from res/ into a single texture atlas.
+Run from the repository root after changing any of the sprites:
+
+    python src/atlas.py
+
+This writes res/atlas.png and res/atlas.json. The game loads the atlas when it exists,
+so all the sprites share one texture and raylib can batch them together.
+"""
+import os
+import json
+
+import pyray as pr
+
+ATLAS_IMAGE = "atlas.png"
+ATLAS_DATA = "atlas.json"
+
+# the full screen images (menu, controls, level) are too big to share a texture with the sprites
+ATLAS_SPRITES = {
+    "squid_body": "squid-body.png",
+    "squid_tentacle": "squid-tentacle.png",
+    "squid_ltentacle": "squid-ltentacle.png",
+    "guy1": "guy1.png",
+    "guy2": "guy2.png",
+    "boat": "boat.png",
+    "water": "water.png",
+    "fish": "fish.png",
+}
+
+# empty pixels around every sprite, so fractional source rectangles don't bleed into the neighbours
+PADDING = 2
+
+class AtlasSprite():
+    """
+    A sprite inside the atlas texture. It has the width and height of the original image,
+    so it can be used in place of the texture the sprite was loaded from.
+    Source rectangles are relative to the sprite - the sprite batch adds the offset.
+    """
+    texture: pr.Texture2D
+    x: int
+    y: int
+    width: int
+    height: int
+
+    def __init__(self, texture: pr.Texture2D, x: int, y: int, width: int, height: int):
+        self.texture = texture
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+
+def pack(sizes: dict[str, tuple[int, int]], max_width: int = 256) -> tuple[dict[str, tuple[int, int]], int, int]:
+    """
+    Place rectangles of the given sizes into shelves, tallest first.
+    Returns the position of every rectangle and the size of the atlas (rounded up to powers of two).
+    """
+    positions = {}
+    x = y = shelf_height = width = 0
+    for name, (w, h) in sorted(sizes.items(), key=lambda item: (-item[1][1], item[0])):
+        w += PADDING * 2
+        h += PADDING * 2
+        if x + w > max_width and x > 0:
+            x = 0
+            y += shelf_height
+            shelf_height = 0
+        positions[name] = (x + PADDING, y + PADDING)
+        x += w
+        width = max(width, x)
+        shelf_height = max(shelf_height, h)
+    height = y + shelf_height
+
+    atlas_width = 1
+    while atlas_width < width:
+        atlas_width *= 2
+    atlas_height = 1
+    while atlas_height < height:
+        atlas_height *= 2
+    return positions, atlas_width, atlas_height
+
+def build_atlas(res_dir: str = "res"):
+    images = {name: pr.load_image(os.path.join(res_dir, file)) for name, file in ATLAS_SPRITES.items()}
+    for image in images.values():
+        pr.image_format(image, pr.PIXELFORMAT_UNCOMPRESSED_R8G8B8A8)
+    positions, width, height = pack({name: (image.width, image.height) for name, image in images.items()})
+
+    atlas = pr.gen_image_color(width, height, pr.BLANK)
+    sprites = {}
+    for name, image in images.items():
+        x, y = positions[name]
+        # copy the pixels as they are - image_draw would blend them with the blank background
+        for py in range(image.height):
+            for px in range(image.width):
+                pr.image_draw_pixel(atlas, x + px, y + py, pr.get_image_color(image, px, py))
+        sprites[name] = {"x": x, "y": y, "w": image.width, "h": image.height}
+        pr.unload_image(image)
+
+    pr.export_image(atlas, os.path.join(res_dir, ATLAS_IMAGE))
+    pr.unload_image(atlas)
+    with open(os.path.join(res_dir, ATLAS_DATA), "w") as f:
+        json.dump({"size": [width, height], "sprites": sprites}, f, indent=4)
+
+def atlas_sprites(texture: pr.Texture2D, data: dict) -> dict[str, AtlasSprite]:
+    """ The sprites of an atlas texture, from the parsed atlas json """
+    return {name: AtlasSprite(texture, s["x"], s["y"], s["w"], s["h"]) for name, s in data["sprites"].items()}
+
+def has_atlas(res_dir: str = "res") -> bool:
+    return os.path.exists(os.path.join(res_dir, ATLAS_IMAGE)) and os.path.exists(os.path.join(res_dir, ATLAS_DATA))
+
+if __name__ == "__main__":
+    build_atlas()
@@ -0,0 +1,203 @@
+"""
+Microbenchmarks for the simulation hot paths.
+Runs without a window. Run from the repository root:
+
+    python src/bench.py --out bench.json
+    python src/bench.py --compare bench.json
+
+Every benchmark reports operations per second and the memory allocated per call,
+and the results can be saved as json and compared against an earlier run.
+"""
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tracemalloc
+
+from pymunk.vec2d import Vec2d as Vec2
+
+from world import World, Inputs, PHYSICS_DT, load_headless_game_data
+from walls import load_level_walls
+from utils import calc_boyancy
+from ship import Ship
+from fish import Fish
+
+BENCH_SEED = 1234
+# how many frames the world runs before measuring, so the ships settle on the water
+WARMUP_FRAMES = 120
+
+BENCHMARKS: dict[str, callable] = {}
+
+def benchmark(name: str):
+    """
+    Register a benchmark. The decorated function gets a fresh world
+    and returns the function that should be timed.
+    """
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+def make_world(res_dir: str = "res") -> World:
+    random.seed(BENCH_SEED)
+    world = World(load_headless_game_data(res_dir), load_level_walls(res_dir))
+    inputs = Inputs(world.squid.body.position + Vec2(0, 100))
+    for _ in range(WARMUP_FRAMES):
+        world.step(PHYSICS_DT, inputs)
+    return world
+
+def first_ship(world: World) -> Ship:
+    return next(obj for obj in world.game_objects if isinstance(obj, Ship))
+
+def spawn_fish(world: World) -> Fish:
+    fish = Fish(world.game_data, world.squid.body.position + Vec2(0, 200), world.space)
+    world.game_objects.append(fish)
+    return fish
+
+@benchmark("utils.calc_boyancy")
+def bench_calc_boyancy(world: World):
+    body = first_ship(world).body
+    return lambda: calc_boyancy(body)
+
+@benchmark("BuoyancySystem.update")
+def bench_buoyancy_update(world: World):
+    return world.buoyancy.update
+
+@benchmark("Squid.update")
+def bench_squid_update(world: World):
+    return lambda: world.squid.update(PHYSICS_DT)
+
+@benchmark("Squid.reach")
+def bench_squid_reach(world: World):
+    target = world.squid.body.position + Vec2(40, 40)
+    return lambda: world.squid.reach(target)
+
+@benchmark("Squid.get_spread")
+def bench_squid_get_spread(world: World):
+    return world.squid.get_spread
+
+@benchmark("Ship.update")
+def bench_ship_update(world: World):
+    ship = first_ship(world)
+    return lambda: ship.update(PHYSICS_DT)
+
+@benchmark("Human.update")
+def bench_human_update(world: World):
+    human = first_ship(world).humans[0]
+    return lambda: human.update(PHYSICS_DT)
+
+@benchmark("Fish.update")
+def bench_fish_update(world: World):
+    fish = spawn_fish(world)
+    return lambda: fish.update(PHYSICS_DT)
+
+@benchmark("space.step")
+def bench_space_step(world: World):
+    return lambda: world.space.step(PHYSICS_DT)
+
+@benchmark("World.step")
+def bench_world_step(world: World):
+    inputs = Inputs(world.squid.body.position + Vec2(100, 100), left_down=True)
+    return lambda: world.step(PHYSICS_DT, inputs)
+
+def time_call(fn, min_time: float) -> tuple[int, float]:
+    """ Call fn in growing batches until min_time has passed. Returns (calls, seconds) """
+    calls = 0
+    batch = 1
+    start = time.perf_counter()
+    elapsed = 0.0
+    while elapsed < min_time:
+        for _ in range(batch):
+            fn()
+        calls += batch
+        batch *= 2
+        elapsed = time.perf_counter() - start
+    return calls, elapsed
+
+def measure_allocations(fn, calls: int) -> tuple[float, float]:
+    """ Returns (peak bytes allocated during a call, allocated blocks left alive per call) """
+    tracemalloc.start()
+    fn() # the first call may fill caches
+    blocks_before = sys.getallocatedblocks()
+    peak_total = 0
+    for _ in range(calls):
+        tracemalloc.reset_peak()
+        start, _ = tracemalloc.get_traced_memory()
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+        peak_total += peak - start
+    blocks_after = sys.getallocatedblocks()
+    tracemalloc.stop()
+    return peak_total / calls, (blocks_after - blocks_before) / calls
+
+def run(names: list[str], min_time: float, alloc_calls: int, res_dir: str = "res") -> dict:
+    results = {}
+    for name in names:
+        # timing and allocation tracking each get their own world, so they measure the same state.
+        # the world has to be kept alive here - bodies only hold a weak reference to their space
+        world = make_world(res_dir)
+        fn = BENCHMARKS[name](world)
+        calls, elapsed = time_call(fn, min_time)
+        world = make_world(res_dir)
+        fn = BENCHMARKS[name](world)
+        alloc_bytes, alloc_blocks = measure_allocations(fn, alloc_calls)
+        results[name] = {
+            "ops_per_sec": calls / elapsed,
+            "us_per_op": elapsed / calls * 1e6,
+            "alloc_bytes_per_op": alloc_bytes,
+            "retained_blocks_per_op": alloc_blocks,
+            "calls": calls,
+        }
+        print("%-20s %12.0f ops/s %10.2f us/op %10.0f B/op" % (name, calls / elapsed, elapsed / calls * 1e6, alloc_bytes))
+    return results
+
+def compare(results: dict, baseline: dict, threshold: float) -> bool:
+    """ Print the change against a baseline run. Returns False if anything got slower than the threshold """
+    ok = True
+    print()
+    print("%-20s %12s %12s %8s" % ("benchmark", "baseline", "current", "change"))
+    for name, res in results.items():
+        if name not in baseline:
+            continue
+        old = baseline[name]["ops_per_sec"]
+        new = res["ops_per_sec"]
+        change = (new - old) / old
+        flag = ""
+        if change < -threshold:
+            flag = " REGRESSION"
+            ok = False
+        print("%-20s %12.0f %12.0f %+7.1f%%%s" % (name, old, new, change * 100, flag))
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the simulation hot paths")
+    parser.add_argument("-b", "--bench", action="append", choices=list(BENCHMARKS), help="only run these benchmarks")
+    parser.add_argument("--min-time", type=float, default=0.5, help="seconds to spend timing each benchmark")
+    parser.add_argument("--alloc-calls", type=int, default=50, help="calls used to measure allocations")
+    parser.add_argument("--out", help="save the results to this json file")
+    parser.add_argument("--compare", help="compare against results saved with --out")
+    parser.add_argument("--threshold", type=float, default=0.10, help="slowdown that counts as a regression")
+    parser.add_argument("--res", default="res", help="resource directory")
+    args = parser.parse_args()
+
+    results = run(args.bench or list(BENCHMARKS), args.min_time, args.alloc_calls, args.res)
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "results": results,
+            }, f, indent=4)
+
+    if args.compare:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)["results"]
+        if not compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+import numpy as np
+import pymunk as pm
+from pymunk.vec2d import Vec2d as Vec2
+
+# the same factor calc_boyancy uses - water is a bit denser than what the areas say
+WATER_DENSITY = 1.025
+# bodies with less submerged area than this don't float at all
+MIN_AREA = 1
+
+def polygon_moments(p0: np.ndarray, p1: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """ Signed area and first moment of polygons given as the start and end points of their edges """
+    cross = p0[..., 0] * p1[..., 1] - p1[..., 0] * p0[..., 1]
+    area = cross.sum(axis=1) / 2
+    moment = np.stack((
+        ((p0[..., 0] + p1[..., 0]) * cross).sum(axis=1),
+        ((p0[..., 1] + p1[..., 1]) * cross).sum(axis=1),
+    ), axis=1) / 6
+    return area, moment
+
+def clip_below_waterline(verts: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Clip polygons against the waterline at y=0 and keep the part below it (y > 0).
+    verts has the shape (polygons, vertices, 2) in world coordinates, shorter polygons
+    are padded by repeating their last vertex.
+    Returns the signed area of each clipped polygon and its first moment (area * centroid).
+
+    Each edge is clipped on its own - the new edges that run along the waterline
+    have y=0 everywhere, so they add nothing to the area or moment sums.
+    """
+    a = verts
+    b = np.roll(verts, -1, axis=1)
+    ay = a[..., 1]
+    by = b[..., 1]
+    dy = ay - by
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t_cross = np.where(dy != 0, ay / dy, 0.0)
+    # the part of the edge a + t(b - a) with t in [t0, t1] lies below the waterline
+    t0 = np.where((ay < 0) & (by >= 0), t_cross, 0.0)
+    t1 = np.where((ay >= 0) & (by < 0), t_cross, 1.0)
+    # edges entirely above the water collapse to a point and drop out of the sums
+    above = (ay < 0) & (by < 0)
+    t0[above] = 0.0
+    t1[above] = 0.0
+    d = b - a
+    p0 = a + t0[..., None] * d
+    p1 = a + t1[..., None] * d
+    return polygon_moments(p0, p1)
+
+class BuoyancySystem():
+    """
+    Computes the submerged area and centre of buoyancy of every floating body in one numpy pass.
+    Registered bodies get the result in body.buoyancy as (area, center), the same values
+    calc_boyancy returns, after every call to update().
+    Bodies whose bounds are entirely above or below the waterline skip the clipping.
+    """
+    bodies: list[pm.Body]
+    dirty: bool
+
+    def __init__(self):
+        self.bodies = []
+        self.dirty = True
+
+    def add(self, body: pm.Body):
+        self.bodies.append(body)
+        body.buoyancy = (0, Vec2(0, 0))
+        self.dirty = True
+
+    def remove(self, body: pm.Body):
+        if body in self.bodies:
+            self.bodies.remove(body)
+            self.dirty = True
+
+    def rebuild(self):
+        """ Gather the local hull vertices of every registered body into flat arrays """
+        shapes = [(i, s) for i, b in enumerate(self.bodies) for s in b.shapes if isinstance(s, pm.Poly)]
+        max_verts = max([len(s.get_vertices()) for _, s in shapes], default=3)
+        self.local_verts = np.zeros((len(shapes), max_verts, 2))
+        self.owner = np.zeros(len(shapes), dtype=np.intp)
+        for k, (i, shape) in enumerate(shapes):
+            verts = [tuple(v) for v in shape.get_vertices()]
+            verts += [verts[-1]] * (max_verts - len(verts))
+            self.local_verts[k] = verts
+            self.owner[k] = i
+
+        n = len(self.bodies)
+        self.radius = np.zeros(n)
+        np.maximum.at(self.radius, self.owner, np.linalg.norm(self.local_verts, axis=2).max(axis=1, initial=0))
+
+        # the area and centroid of the whole body, for bodies that are entirely under water
+        area, moment = polygon_moments(self.local_verts, np.roll(self.local_verts, -1, axis=1))
+        # clipping keeps the winding, so this also orients the clipped polygons
+        self.winding = np.sign(area)
+        self.full_area = np.bincount(self.owner, np.abs(area), minlength=n)
+        full_moment = np.stack((
+            np.bincount(self.owner, moment[:, 0] * self.winding, minlength=n),
+            np.bincount(self.owner, moment[:, 1] * self.winding, minlength=n),
+        ), axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.full_center = np.where(self.full_area[:, None] > 0, full_moment / self.full_area[:, None], 0.0)
+        self.dirty = False
+
+    def update(self):
+        if self.dirty:
+            self.rebuild()
+        n = len(self.bodies)
+        if n == 0:
+            return
+
+        pos = np.array([b.position for b in self.bodies])
+        angle = np.array([b.angle for b in self.bodies])
+        cos = np.cos(angle)
+        sin = np.sin(angle)
+
+        above = pos[:, 1] + self.radius <= 0
+        below = pos[:, 1] - self.radius >= 0
+
+        area = np.zeros(n)
+        center = np.zeros((n, 2))
+
+        # entirely under water - the whole body floats
+        fc = self.full_center
+        area[below] = self.full_area[below]
+        center[below, 0] = pos[below, 0] + fc[below, 0] * cos[below] - fc[below, 1] * sin[below]
+        center[below, 1] = pos[below, 1] + fc[below, 0] * sin[below] + fc[below, 1] * cos[below]
+
+        # on the waterline - clip the hulls
+        straddle = ~(above | below)
+        shape_mask = straddle[self.owner]
+        if shape_mask.any():
+            owner = self.owner[shape_mask]
+            local = self.local_verts[shape_mask]
+            c = cos[owner][:, None]
+            s = sin[owner][:, None]
+            world = np.empty_like(local)
+            world[..., 0] = local[..., 0] * c - local[..., 1] * s + pos[owner, 0][:, None]
+            world[..., 1] = local[..., 0] * s + local[..., 1] * c + pos[owner, 1][:, None]
+            shape_area, moment = clip_below_waterline(world)
+            sign = self.winding[shape_mask]
+            clipped_area = np.bincount(owner, shape_area * sign, minlength=n)
+            area[straddle] = clipped_area[straddle]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                for axis in range(2):
+                    total = np.bincount(owner, moment[:, axis] * sign, minlength=n)
+                    center[straddle, axis] = np.where(clipped_area[straddle] > 0, total[straddle] / clipped_area[straddle], 0.0)
+
+        floating = area >= MIN_AREA
+        area = np.where(floating, area * WATER_DENSITY, 0.0)
+        center[~floating] = 0.0
+        for body, a, c in zip(self.bodies, area.tolist(), center.tolist()):
+            body.buoyancy = (a, Vec2(c[0], c[1]))
@@ -0,0 +1,135 @@
+import pymunk as pm
+from pymunk.vec2d import Vec2d as Vec2
+
+# objects further than SLEEP_RADIUS from the squid go dormant, and wake up again inside WAKE_RADIUS.
+# the camera sees about 260x150 units around the squid, so both are well off screen
+WAKE_RADIUS = 800
+SLEEP_RADIUS = 1000
+
+def simulated(bodies: list[pm.Body]) -> list[pm.Body]:
+    """ The bodies that can sleep, the ones in the space that move """
+    return [b for b in bodies if b.space is not None and b.body_type == pm.Body.DYNAMIC]
+
+def touching_bodies(body: pm.Body) -> list[pm.Body]:
+    """
+    The other moving bodies that overlap the body's shapes.
+    The shapes are queried instead of going through the body's arbiters, those only exist once the
+    space has been stepped, and an object can go to sleep before that.
+    """
+    found = []
+    for shape in body.shapes:
+        for info in body.space.shape_query(shape):
+            other = info.shape.body
+            if other is not body and other.body_type == pm.Body.DYNAMIC:
+                found.append(other)
+    return found
+
+class Dormancy():
+    """
+    Freezes game objects that are far away from the squid.
+    A dormant object is not updated, and its bodies are put to sleep together in pymunk,
+    so the space doesn't simulate them either. Objects that touch each other sleep as one group.
+    An object that pymunk wakes up stops being dormant. Objects are checked in order every tick,
+    so the same session always wakes the same objects at the same time.
+
+    Objects that can go dormant implement get_bodies(), the first body is the one whose
+    position is checked.
+    """
+    wake_radius: float
+    sleep_radius: float
+    dormant: set[int]
+
+    def __init__(self, wake_radius: float = WAKE_RADIUS, sleep_radius: float = SLEEP_RADIUS):
+        self.wake_radius = wake_radius
+        self.sleep_radius = sleep_radius
+        self.dormant = set()
+
+    def is_dormant(self, obj) -> bool:
+        return id(obj) in self.dormant
+
+    def update(self, center: Vec2, objects: list):
+        wake_sq = self.wake_radius * self.wake_radius
+        sleep_sq = self.sleep_radius * self.sleep_radius
+        sleepy = []
+        for obj in objects:
+            if not hasattr(obj, "get_bodies"):
+                continue
+            bodies = obj.get_bodies()
+            dist_sq = bodies[0].position.get_dist_sqrd(center)
+            if id(obj) in self.dormant:
+                if dist_sq < wake_sq:
+                    self.wake(obj, bodies)
+                elif not all(b.is_sleeping for b in simulated(bodies)):
+                    # something awake ran into it and pymunk woke it up, it is updated again until it can sleep
+                    self.dormant.discard(id(obj))
+            elif dist_sq > sleep_sq:
+                sleepy.append((obj, bodies))
+        if sleepy:
+            self.sleep_touching(sleepy, objects)
+
+    def sleep_touching(self, sleepy: list[tuple[object, list[pm.Body]]], objects: list):
+        """
+        Put the objects to sleep, the ones that touch each other in one group.
+        Sleeping groups that touch would wake each other, so an object touching anything that stays awake
+        (or is already asleep) waits, together with everything it touches. Once the other one is woken
+        or goes dormant too, they are put to sleep together.
+        """
+        owners = {}
+        for obj in objects:
+            if hasattr(obj, "get_bodies"):
+                for body in obj.get_bodies():
+                    owners[body] = obj
+        sleepy_ids = {id(obj) for obj, _ in sleepy}
+        touching = {}
+        blocked = set()
+        for obj, bodies in sleepy:
+            touching[id(obj)] = []
+            for body in simulated(bodies):
+                for other in touching_bodies(body):
+                    owner = owners.get(other)
+                    if owner is obj:
+                        continue
+                    if owner is not None and id(owner) in sleepy_ids:
+                        touching[id(obj)].append(owner)
+                    else:
+                        blocked.add(id(obj))
+
+        # every group of touching objects sleeps together, or not at all
+        grouped = set()
+        for obj, bodies in sleepy:
+            if id(obj) in grouped:
+                continue
+            group = [obj]
+            grouped.add(id(obj))
+            for member in group:
+                for other in touching[id(member)]:
+                    if id(other) not in grouped:
+                        grouped.add(id(other))
+                        group.append(other)
+            if any(id(member) in blocked for member in group):
+                continue
+            self.sleep(group, [b for member in group for b in member.get_bodies()])
+
+    def sleep(self, objects: list, bodies: list[pm.Body]):
+        bodies = simulated(bodies)
+        # pymunk puts idle bodies to sleep on its own, and a sleeping body can't join another group
+        for body in bodies:
+            body.activate()
+        if bodies:
+            # the bodies touch each other, so they have to sleep as one group,
+            # otherwise the awake ones would wake the others right away
+            bodies[0].sleep()
+            for body in bodies[1:]:
+                body.sleep_with_group(bodies[0])
+        for obj in objects:
+            self.dormant.add(id(obj))
+
+    def wake(self, obj, bodies: list[pm.Body]):
+        for body in bodies:
+            if body.space is not None:
+                body.activate()
+        self.dormant.discard(id(obj))
+
+    def forget(self, obj):
+        """ Stop tracking an object that was removed from the world """
+        self.dormant.discard(id(obj))
@@ -5,39 +5,64 @@ import pyray as pr
 import pymunk as pm
 from pymunk.vec2d import Vec2d as Vec2
 
-from utils import SQUID_SHAPE_GROUP, SQUID_CATEGORY, FISH_CATEGORY, FISH_GROUP
+from utils import body_bb, Transform, SQUID_SHAPE_GROUP, SQUID_CATEGORY, FISH_CATEGORY, FISH_GROUP
+import sprite_batch as sprites
+from sprite_batch import LAYER_FISH
+from animation import AnimationTable
+
+# like the humans, fish could turn back and forth every frame while they see the squid
+turnaround_cooldown = 0.5
+
+# how fast each state plays its animation, 1 is the frame durations of the sprite sheet
+ANIM_SPEED = {"idle": 0.1, "swim": 0.3, "run": 0.5}
 
 class Fish():
     texture: pr.Texture2D
-    animation_data: dict
-    cur_animation: str
+    animations: AnimationTable
+    cur_animation: int
     anim_time: float
     facing_right: bool
     state: str
     state_time: float
+    turnaround_time: float
+    # set by the world's perception pass every tick
+    sees_squid: bool
 
     fish_size: Vec2
+    body_shape: pm.Poly
 
     def __init__(self, game_data: dict, position: Vec2, space: pm.Space):
         self.texture = game_data["textures"]["fish"]
-        self.animation_data = game_data["animation_data"]["fish"]
-        self.cur_animation = "swim"
+        self.animations = game_data["animations"]["fish"]
+
+        self.body = pm.Body()
+        self.body.game_object = self
+        fish_size = Vec2(16*2, 8*2)
+        self.human_size = fish_size
+        self.body_shape = pm.Poly.create_box(self.body, fish_size, 0)
+        self.body_shape.mass = 0.2
+        self.body_shape.friction = 5
+
+        self.reset(position, space)
+
+    def reset(self, position: Vec2, space: pm.Space):
+        """ (Re)start the fish at the position - fish taken from the pool go through here again """
+        self.cur_animation = self.animations.tag("swim")
         self.anim_time = 0
         self.facing_right = random.choice([True, False])
         self.state = "idle"
         self.state_time = random.random() * 4 + 2.0
+        self.turnaround_time = 0
+        self.sees_squid = False
 
-        self.body = pm.Body()
-        self.body.game_object = self
         self.body.position = position
-        fish_size = Vec2(16*2, 8*2)
-        self.human_size = fish_size
-        body_shape = pm.Poly.create_box(self.body, fish_size, 0)
-        body_shape.mass = 0.2
-        body_shape.friction = 5
-        body_shape.filter = pm.ShapeFilter(group=FISH_GROUP, categories=FISH_CATEGORY)
+        self.body.velocity = (0, 0)
+        self.body.angle = 0
+        self.body.angular_velocity = 0
+        # being caught clears the filter
+        self.body_shape.filter = pm.ShapeFilter(group=FISH_GROUP, categories=FISH_CATEGORY)
 
-        space.add(self.body, body_shape)
+        space.add(self.body, self.body_shape)
 
     def update(self, dt: float):
         if self.state == "eaten":
@@ -46,11 +71,12 @@ class Fish():
         self.body.velocity *= 1-(1 * dt)
         self.body.angle = 0
 
-        self.anim_time += dt * {"idle": 1, "swim": 3, "run": 5}[self.state] 
-        anim = [a for a in self.animation_data["meta"]["frameTags"] if a["name"] == self.cur_animation][0]
-        if self.anim_time >= anim["to"] - anim["from"] + 1:
-            self.anim_time -= anim["to"] - anim["from"] + 1
+        self.anim_time += dt * ANIM_SPEED[self.state]
+        anim_length = self.animations.tag_duration[self.cur_animation]
+        if self.anim_time >= anim_length:
+            self.anim_time -= anim_length
 
+        self.turnaround_time -= dt
         self.state_time -= dt
         if self.state_time < 0:
             self.state_time = random.random() * 4 + 2.0
@@ -58,47 +84,55 @@ class Fish():
             if random.random() > 0.45:
                 self.facing_right = not self.facing_right
         
-        # cast a "ray" to check if we see the squid
-        sight_range = 50
-        if self.body.space is not None and len(self.body.space.bb_query(
-            pm.BB(
-                self.body.position.x if self.facing_right else (self.body.position.x - sight_range),
-                self.body.position.y - 1,
-                (self.body.position.x + sight_range) if self.facing_right else self.body.position.x,
-                self.body.position.y + 1
-            ), shape_filter=pm.ShapeFilter(group=FISH_GROUP, mask=FISH_CATEGORY))) > 0:
+        # the world's perception pass checks the sight boxes of all npcs at once, see get_sight_bb
+        if self.sees_squid:
             self.state = "run"
             if self.turnaround_time <= 0:
                 self.facing_right = not self.facing_right # run away from squid
+                self.turnaround_time = turnaround_cooldown
             self.state_time = 10 + random.random() * 10
 
         if self.state == "idle":
-            self.cur_animation = "swim"
+            self.cur_animation = self.animations.tag("swim")
         elif self.state == "swim" or self.state == "run":
-            self.cur_animation = self.state
+            self.cur_animation = self.animations.tag(self.state)
             speed = 10 if self.state == "swim" else 20
             if self.facing_right:
                 self.body.position += Vec2(1, 0).rotated(self.body.angle) * speed * dt
             else:
                 self.body.position += Vec2(1, 0).rotated(self.body.angle) * -speed * dt
 
-    def draw(self, mpos: Vec2):
+    def get_bodies(self) -> list[pm.Body]:
+        return [self.body]
+
+    def get_sight_bb(self) -> pm.BB:
+        """ We "see" the squid if it touches this thin box in front of us """
+        sight_range = 50
+        return pm.BB(
+            self.body.position.x if self.facing_right else (self.body.position.x - sight_range),
+            self.body.position.y - 1,
+            (self.body.position.x + sight_range) if self.facing_right else self.body.position.x,
+            self.body.position.y + 1
+        )
+
+    def get_bb(self) -> pm.BB:
+        return body_bb(self.body)
+
+    def draw(self, mpos: Vec2, transform: Transform):
+        """ transform gives the position and angle to draw a body at """
         if self.state == "eaten":
             return
-        anims = self.animation_data["meta"]["frameTags"]
-        anim = [a for a in anims if a["name"] == self.cur_animation][0]
-        frame_n = anim["from"] + math.floor(self.anim_time)
-        frame_data = self.animation_data["frames"][frame_n]
-        wdt = frame_data["frame"]["w"]
-        hgt = frame_data["frame"]["h"]
-        
-        pr.draw_texture_pro(self.texture, 
-            (frame_data["frame"]["x"], 
-            frame_data["frame"]["y"], 
+        x, y, wdt, hgt = self.animations.rects[self.animations.frame(self.cur_animation, self.anim_time)]
+        position, angle = transform(self.body)
+
+        sprites.draw_texture_pro(self.texture,
+            (x,
+            y,
             -wdt if self.facing_right else wdt, 
             hgt),
-            (self.body.position.x, self.body.position.y, wdt * 2, hgt * 2),
+            (position.x, position.y, wdt * 2, hgt * 2),
             (wdt, hgt),
-            self.body.angle * 180 / math.pi,
-            pr.WHITE)
+            angle * 180 / math.pi,
+            pr.WHITE,
+            layer=LAYER_FISH)
 
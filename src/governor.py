@@ -0,0 +1,90 @@
+import logging
+
+import pymunk as pm
+
+logger = logging.getLogger(__name__)
+
+# how long a tick's space steps may take together
+PHYSICS_BUDGET = 0.004
+# the bounds of the quality levels
+MIN_ITERATIONS = 4
+MAX_ITERATIONS = 10
+MIN_SUBSTEPS = 1
+MAX_SUBSTEPS = 4
+ITERATION_STEP = 2
+# the step time is smoothed over about 1 / SMOOTHING ticks
+SMOOTHING = 0.1
+# quality goes down as soon as the smoothed time is over the budget, and back up
+# only when it is well under it, and not sooner than the cooldowns after the last change
+UPGRADE_BELOW = 0.5
+DOWNGRADE_COOLDOWN = 30
+UPGRADE_COOLDOWN = 240
+
+class PhysicsGovernor():
+    """
+    Trades physics accuracy for speed when the space steps take longer than the budget.
+    The quality levels are combinations of substeps and solver iterations within the bounds,
+    ordered by how many solver passes a tick costs. The governor starts at the world's settings
+    (the way the game is meant to feel) and moves one level at a time, down as far as the machine
+    needs and up as far as it allows. Every change is logged at INFO.
+
+    It makes the simulation depend on how fast the machine is, so headless runs leave it off.
+    """
+    levels: list[tuple[int, int]]
+    level: int
+    budget: float
+    average: float
+    ticks_since_change: int
+    # (tick, substeps, iterations, smoothed step time) for every change
+    changes: list[tuple[int, int, int, float]]
+
+    def __init__(self, space: pm.Space, substeps: int, budget: float = PHYSICS_BUDGET,
+                 min_substeps: int = MIN_SUBSTEPS, max_substeps: int = MAX_SUBSTEPS,
+                 min_iterations: int = MIN_ITERATIONS, max_iterations: int = MAX_ITERATIONS):
+        # the world's own settings are always one of the levels, even outside the bounds
+        start = (substeps, space.iterations)
+        iterations = list(range(max_iterations, min_iterations - 1, -ITERATION_STEP)) + [min_iterations, start[1]]
+        levels = {(s, i) for s in set(range(min_substeps, max_substeps + 1)) | {start[0]} for i in iterations}
+        # a ladder through the world's settings where neither the substeps nor the iterations ever go up on the
+        # way down. every rung is the most expensive level below the last one, with more substeps first among
+        # equal costs since they are more stable, and the same upwards with the cheapest level above
+        self.levels = [start]
+        while True:
+            lower = [l for l in levels if l[0] <= self.levels[-1][0] and l[1] <= self.levels[-1][1] and l != self.levels[-1]]
+            if not lower:
+                break
+            self.levels.append(max(lower, key=lambda l: (l[0] * l[1], l[0])))
+        while True:
+            higher = [l for l in levels if l[0] >= self.levels[0][0] and l[1] >= self.levels[0][1] and l != self.levels[0]]
+            if not higher:
+                break
+            self.levels.insert(0, min(higher, key=lambda l: (l[0] * l[1], -l[0])))
+        self.level = self.levels.index(start)
+        self.budget = budget
+        self.average = 0.0
+        self.ticks_since_change = 0
+        self.changes = []
+
+    @property
+    def substeps(self) -> int:
+        return self.levels[self.level][0]
+
+    @property
+    def iterations(self) -> int:
+        return self.levels[self.level][1]
+
+    def update(self, step_time: float, tick: int) -> bool:
+        """ Record how long the tick's space steps took. Returns True if the quality changed """
+        self.average += (step_time - self.average) * SMOOTHING
+        self.ticks_since_change += 1
+        if self.average > self.budget and self.ticks_since_change >= DOWNGRADE_COOLDOWN and self.level < len(self.levels) - 1:
+            self.level += 1
+        elif self.average < self.budget * UPGRADE_BELOW and self.ticks_since_change >= UPGRADE_COOLDOWN and self.level > 0:
+            self.level -= 1
+        else:
+            return False
+        self.ticks_since_change = 0
+        self.changes.append((tick, self.substeps, self.iterations, self.average))
+        logger.info("tick %d: physics step %.2f ms, now %d substeps and %d iterations",
+                    tick, self.average * 1000, self.substeps, self.iterations)
+        return True
@@ -5,21 +5,28 @@ import pyray as pr
 import pymunk as pm
 from pymunk.vec2d import Vec2d as Vec2
 
-from utils import calc_boyancy, SQUID_SHAPE_GROUP, SQUID_CATEGORY, HUMAN_GROUP, HUMAN_CATEGORY
+from utils import body_bb, Transform, SQUID_SHAPE_GROUP, SQUID_CATEGORY, HUMAN_GROUP, HUMAN_CATEGORY
+import sprite_batch as sprites
+from sprite_batch import LAYER_SHIPS
+from animation import AnimationTable
 
 # sometimes the humans spaz out and turn around too quickly - this is a hard fix to prevent that
 turnaround_cooldown = 0.5
 max_breath = 10
+# how fast the animations play, 1 is the frame durations of the sprite sheet
+ANIM_SPEED = 0.5
 
 class Human():
     texture: pr.Texture2D
-    animation_data: dict
-    cur_animation: str
+    animations: AnimationTable
+    cur_animation: int
     anim_time: float
     facing_right: bool
     state: str
     state_time: float
     turnaround_time: float
+    # set by the world's perception pass every tick
+    sees_squid: bool
 
     human_size: Vec2
 
@@ -27,14 +34,15 @@ class Human():
 
     def __init__(self, game_data: dict, position: Vec2, space: pm.Space):
         self.texture = game_data["textures"]["guy2"]
-        self.animation_data = game_data["animation_data"]["guy2"]
-        self.cur_animation = "neutral"
+        self.animations = game_data["animations"]["guy2"]
+        self.cur_animation = self.animations.tag("neutral")
         self.anim_time = 0
         self.facing_right = random.choice([True, False])
         self.state = "idle"
         self.state_time = random.random() * 4 + 2.0
         self.turnaround_time = 0
         self.breath = max_breath
+        self.sees_squid = False
 
         self.body = pm.Body()
         self.body.game_object = self
@@ -47,6 +55,7 @@ class Human():
         body_shape.filter = pm.ShapeFilter(group=HUMAN_GROUP, categories=HUMAN_CATEGORY)
 
         space.add(self.body, body_shape)
+        self.body.buoyancy = (0, Vec2(0, 0))
 
     def update(self, dt: float):
         if self.state == "eaten":
@@ -58,7 +67,7 @@ class Human():
         self.body.apply_force_at_world_point(Vec2(0, 6000 * dt * self.body.mass),  self.body.position)
 
         # apply buoyancy
-        buo_area, buo_center = calc_boyancy(self.body)
+        buo_area, buo_center = self.body.buoyancy
         self.body.apply_force_at_world_point(Vec2(0, -10 * dt * buo_area * (0.1 if self.state == "dead" else 1)), buo_center)
 
         if self.state == "dead":
@@ -85,16 +94,16 @@ class Human():
                 self.breath = 0
                 self.state = "dead"
                 self.state_time = 99999
-                self.cur_animation = "dead"
+                self.cur_animation = self.animations.tag("dead")
                 return
         else:
             self.breath = min(self.breath + dt, max_breath)
 
         self.turnaround_time -= dt
-        self.anim_time += dt * 5
-        anim = [a for a in self.animation_data["meta"]["frameTags"] if a["name"] == self.cur_animation][0]
-        if self.anim_time >= anim["to"] - anim["from"] + 1:
-            self.anim_time -= anim["to"] - anim["from"] + 1
+        self.anim_time += dt * ANIM_SPEED
+        anim_length = self.animations.tag_duration[self.cur_animation]
+        if self.anim_time >= anim_length:
+            self.anim_time -= anim_length
 
         self.state_time -= dt
         if self.state_time < 0:
@@ -105,15 +114,8 @@ class Human():
                     self.facing_right = not self.facing_right
                     self.turnaround_time = turnaround_cooldown
         
-        # cast a "ray" to check if we see the squid
-        sight_range = 50
-        if self.body.space is not None and len(self.body.space.bb_query(
-            pm.BB(
-                self.body.position.x if self.facing_right else (self.body.position.x - sight_range),
-                self.body.position.y - 1,
-                (self.body.position.x + sight_range) if self.facing_right else self.body.position.x,
-                self.body.position.y + 1
-            ), shape_filter=pm.ShapeFilter(group=HUMAN_GROUP, mask=SQUID_CATEGORY))) > 0:
+        # the world's perception pass checks the sight boxes of all npcs at once, see get_sight_bb
+        if self.sees_squid:
             self.state = "run"
             if self.turnaround_time <= 0:
                 self.facing_right = not self.facing_right # run away from squid
@@ -132,9 +134,9 @@ class Human():
             self.body.angle *= 1.0 - (5.0 * dt)
 
         if self.state == "idle":
-            self.cur_animation = "neutral"
+            self.cur_animation = self.animations.tag("neutral")
         elif self.state == "walk" or self.state == "run":
-            self.cur_animation = "walk" if self.state == "walk" else "run"
+            self.cur_animation = self.animations.tag("walk" if self.state == "walk" else "run")
             speed = 10 if self.state == "walk" else 20
             if self.facing_right:
                 if landed_left:
@@ -157,25 +159,64 @@ class Human():
                     else:
                         self.state_time = 0
 
-    def draw(self, mpos: Vec2):
+    def get_state(self) -> dict:
+        """ Everything set_state needs to put the human back the way it is """
+        return {
+            "position": tuple(self.body.position),
+            "angle": self.body.angle,
+            "velocity": tuple(self.body.velocity),
+            "angular_velocity": self.body.angular_velocity,
+            "facing_right": self.facing_right,
+            "state": self.state,
+            "state_time": self.state_time,
+            "turnaround_time": self.turnaround_time,
+            "breath": self.breath,
+            "cur_animation": self.cur_animation,
+            "anim_time": self.anim_time,
+        }
+
+    def set_state(self, state: dict):
+        # the angle goes first, setting it moves the position when the centre of gravity isn't at the origin
+        self.body.angle = state["angle"]
+        self.body.position = state["position"]
+        self.body.velocity = state["velocity"]
+        self.body.angular_velocity = state["angular_velocity"]
+        self.facing_right = state["facing_right"]
+        self.state = state["state"]
+        self.state_time = state["state_time"]
+        self.turnaround_time = state["turnaround_time"]
+        self.breath = state["breath"]
+        self.cur_animation = state["cur_animation"]
+        self.anim_time = state["anim_time"]
+
+    def get_sight_bb(self) -> pm.BB:
+        """ We "see" the squid if it touches this thin box in front of us """
+        sight_range = 50
+        return pm.BB(
+            self.body.position.x if self.facing_right else (self.body.position.x - sight_range),
+            self.body.position.y - 1,
+            (self.body.position.x + sight_range) if self.facing_right else self.body.position.x,
+            self.body.position.y + 1
+        )
+
+    def get_bb(self) -> pm.BB:
+        return body_bb(self.body)
+
+    def draw(self, mpos: Vec2, transform: Transform):
+        """ transform gives the position and angle to draw a body at """
         if self.state == "eaten":
             return
-        anims = self.animation_data["meta"]["frameTags"]
-        anim = [a for a in anims if a["name"] == self.cur_animation][0]
-        frame_n = anim["from"] + math.floor(self.anim_time)
-        if frame_n >= anim["to"] + 1:
-            frame_n = anim["to"]
-        frame_data = self.animation_data["frames"][math.floor(frame_n)]
-        wdt = frame_data["frame"]["w"]
-        hgt = frame_data["frame"]["h"]
-        
-        pr.draw_texture_pro(self.texture, 
-            (frame_data["frame"]["x"], 
-            frame_data["frame"]["y"], 
+        x, y, wdt, hgt = self.animations.rects[self.animations.frame(self.cur_animation, self.anim_time)]
+        position, angle = transform(self.body)
+
+        sprites.draw_texture_pro(self.texture,
+            (x,
+            y,
             -wdt if self.facing_right else wdt, 
             hgt),
-            (self.body.position.x, self.body.position.y, wdt * 2, hgt * 2),
+            (position.x, position.y, wdt * 2, hgt * 2),
             (wdt, hgt),
-            self.body.angle * 180 / math.pi,
-            pr.WHITE)
+            angle * 180 / math.pi,
+            pr.WHITE,
+            layer=LAYER_SHIPS)
 
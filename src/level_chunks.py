@@ -0,0 +1,154 @@
+"""
+Splits the level image into chunks, so the game only loads the part of the level the camera can see.
+Run from the repository root after changing the level:
+
+    python src/level_chunks.py
+
+This writes the chunks and an index into res/level_chunks/. The game streams the level
+from the chunks when they exist, and falls back to drawing level.png whole.
+"""
+import os
+import json
+from concurrent.futures import ThreadPoolExecutor, Future
+
+import pyray as pr
+import pymunk as pm
+from pymunk.vec2d import Vec2d as Vec2
+
+import sprite_batch as sprites
+
+CHUNK_DIR = "level_chunks"
+CHUNK_DATA = "chunks.json"
+# in pixels of the level image, well below the texture size limit of any GPU
+CHUNK_SIZE = 512
+# the level is drawn at twice its size
+LEVEL_SCALE = 2
+# chunks this far (in world units) outside the camera are loaded ahead of time
+PREFETCH_MARGIN = 256
+LOAD_WORKERS = 2
+
+def chunk_file(cx: int, cy: int) -> str:
+    return "chunk_%d_%d.png" % (cx, cy)
+
+def build_chunks(res_dir: str = "res", level_file: str = "level.png", chunk_size: int = CHUNK_SIZE):
+    level = pr.load_image(os.path.join(res_dir, level_file))
+    out_dir = os.path.join(res_dir, CHUNK_DIR)
+    os.makedirs(out_dir, exist_ok=True)
+    columns = (level.width + chunk_size - 1) // chunk_size
+    rows = (level.height + chunk_size - 1) // chunk_size
+    for cy in range(rows):
+        for cx in range(columns):
+            x = cx * chunk_size
+            y = cy * chunk_size
+            rect = pr.Rectangle(x, y, min(chunk_size, level.width - x), min(chunk_size, level.height - y))
+            chunk = pr.image_from_image(level, rect)
+            pr.export_image(chunk, os.path.join(out_dir, chunk_file(cx, cy)))
+            pr.unload_image(chunk)
+
+    with open(os.path.join(out_dir, CHUNK_DATA), "w") as f:
+        json.dump({"size": [level.width, level.height], "chunk_size": chunk_size, "columns": columns, "rows": rows}, f, indent=4)
+    pr.unload_image(level)
+
+def has_level_chunks(res_dir: str = "res") -> bool:
+    return os.path.exists(os.path.join(res_dir, CHUNK_DIR, CHUNK_DATA))
+
+class LevelChunks():
+    """
+    The level background, streamed in chunks around the camera.
+    The images are decoded on worker threads, and turned into textures on the main thread
+    (raylib can only create textures there) the next time update() is called.
+    Only chunks the camera already sees are waited for.
+    Chunks are unloaded once they are twice the prefetch margin away from the camera,
+    so moving back and forth at the edge of the margin doesn't reload them every frame.
+    """
+    chunk_dir: str
+    width: int
+    height: int
+    chunk_size: int
+    columns: int
+    rows: int
+    origin: Vec2
+    margin: float
+    textures: dict[tuple[int, int], pr.Texture2D]
+    pending: dict[tuple[int, int], Future]
+    executor: ThreadPoolExecutor
+
+    def __init__(self, res_dir: str = "res", origin: Vec2 = Vec2(0, 0), margin: float = PREFETCH_MARGIN, workers: int = LOAD_WORKERS):
+        self.chunk_dir = os.path.join(res_dir, CHUNK_DIR)
+        with open(os.path.join(self.chunk_dir, CHUNK_DATA), "r") as f:
+            data = json.load(f)
+        self.width, self.height = data["size"]
+        self.chunk_size = data["chunk_size"]
+        self.columns = data["columns"]
+        self.rows = data["rows"]
+        self.origin = origin
+        self.margin = margin
+        self.textures = {}
+        self.pending = {}
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+
+    def chunks_in(self, bb: pm.BB) -> set[tuple[int, int]]:
+        """ The chunks that overlap the given area of the world """
+        size = self.chunk_size * LEVEL_SCALE
+        left = max(int((bb.left - self.origin.x) // size), 0)
+        right = min(int((bb.right - self.origin.x) // size), self.columns - 1)
+        top = max(int((bb.bottom - self.origin.y) // size), 0)
+        bottom = min(int((bb.top - self.origin.y) // size), self.rows - 1)
+        return {(cx, cy) for cy in range(top, bottom + 1) for cx in range(left, right + 1)}
+
+    def load_image(self, cx: int, cy: int) -> pr.Image:
+        return pr.load_image(os.path.join(self.chunk_dir, chunk_file(cx, cy)))
+
+    def update(self, view: pm.BB):
+        """ Start loading the chunks near the view, upload the ones that finished and drop the far ones """
+        m = self.margin
+        visible = self.chunks_in(view)
+        wanted = self.chunks_in(pm.BB(view.left - m, view.bottom - m, view.right + m, view.top + m))
+        keep = self.chunks_in(pm.BB(view.left - 2*m, view.bottom - 2*m, view.right + 2*m, view.top + 2*m))
+
+        for key in wanted:
+            if key not in self.textures and key not in self.pending:
+                self.pending[key] = self.executor.submit(self.load_image, *key)
+
+        for key, future in list(self.pending.items()):
+            # the prefetch should have loaded the visible chunks already,
+            # if it didn't (like on the first frame) wait for them instead of drawing a hole
+            if not future.done() and key not in visible:
+                continue
+            del self.pending[key]
+            image = future.result()
+            if key in keep:
+                self.textures[key] = pr.load_texture_from_image(image)
+            pr.unload_image(image)
+
+        for key in [key for key in self.textures if key not in keep]:
+            pr.unload_texture(self.textures.pop(key))
+
+    def draw(self, view: pm.BB, layer: int):
+        """ Draw the loaded chunks that the view overlaps """
+        size = self.chunk_size * LEVEL_SCALE
+        for key in self.chunks_in(view):
+            texture = self.textures.get(key)
+            if texture is None:
+                continue
+            cx, cy = key
+            sprites.draw_texture_pro(texture,
+                (0, 0, texture.width, texture.height),
+                (self.origin.x + cx * size, self.origin.y + cy * size, texture.width * LEVEL_SCALE, texture.height * LEVEL_SCALE),
+                (0, 0),
+                0,
+                pr.WHITE,
+                layer=layer
+            )
+
+    def unload(self):
+        self.executor.shutdown(wait=True)
+        for future in self.pending.values():
+            pr.unload_image(future.result())
+        self.pending.clear()
+        for texture in self.textures.values():
+            pr.unload_texture(texture)
+        self.textures.clear()
+
+if __name__ == "__main__":
+    build_chunks()
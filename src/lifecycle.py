@@ -0,0 +1,59 @@
+import pymunk as pm
+from pymunk.vec2d import Vec2d as Vec2
+
+from fish import Fish
+from buoyancy import BuoyancySystem
+from dormancy import Dormancy
+
+class Lifecycle():
+    """
+    Takes game objects out of the world once they are gone (eaten, or fish that swam out of range)
+    and keeps removed fish in a pool, so spawning reuses their bodies and shapes.
+
+    Objects leave the update lists right away, but their bodies are removed from the space
+    in a post-step callback, which is safe even when the removal starts inside a step.
+    """
+    space: pm.Space
+    game_data: dict
+    buoyancy: BuoyancySystem
+    dormancy: Dormancy
+    fish_pool: list[Fish]
+    # counters, for soak tests
+    spawned: int
+    reused: int
+    removed: int
+
+    def __init__(self, space: pm.Space, game_data: dict, buoyancy: BuoyancySystem, dormancy: Dormancy):
+        self.space = space
+        self.game_data = game_data
+        self.buoyancy = buoyancy
+        self.dormancy = dormancy
+        self.fish_pool = []
+        self.spawned = 0
+        self.reused = 0
+        self.removed = 0
+
+    def spawn_fish(self, position: Vec2) -> Fish:
+        self.spawned += 1
+        if self.fish_pool:
+            self.reused += 1
+            fish = self.fish_pool.pop()
+            fish.reset(position, self.space)
+            return fish
+        return Fish(self.game_data, position, self.space)
+
+    def despawn(self, obj, container: list):
+        """ Remove the object from the list that updates and draws it, and from the space after this step """
+        if obj not in container:
+            return
+        container.remove(obj)
+        self.buoyancy.remove(obj.body)
+        self.dormancy.forget(obj)
+        self.space.add_post_step_callback(self.remove_from_space, obj.body, obj)
+
+    def remove_from_space(self, space: pm.Space, key: pm.Body, obj):
+        if obj.body.space is not None:
+            space.remove(obj.body, *obj.body.shapes)
+        self.removed += 1
+        if isinstance(obj, Fish):
+            self.fish_pool.append(obj)
@@ -0,0 +1,81 @@
+import numpy as np
+from pymunk.vec2d import Vec2d as Vec2
+
+class ParticleSystem():
+    """
+    Particles kept in fixed size numpy arrays - position, velocity, remaining lifetime and a value
+    (the number shown by point particles). The live particles are always the first `count` entries.
+    Integration is vectorized and dead particles are replaced by live ones from the end,
+    so updating and removing cost the same no matter how big the burst was.
+    When the arrays are full, new particles are dropped.
+    """
+    capacity: int
+    count: int
+    drag: float
+    gravity: np.ndarray
+    position: np.ndarray
+    velocity: np.ndarray
+    life: np.ndarray
+    value: np.ndarray
+
+    def __init__(self, capacity: int, drag: float = 0.0, gravity: tuple[float, float] = (0, 0)):
+        self.capacity = capacity
+        self.count = 0
+        self.drag = drag
+        self.gravity = np.array(gravity, dtype=float)
+        self.position = np.zeros((capacity, 2))
+        self.velocity = np.zeros((capacity, 2))
+        self.life = np.zeros(capacity)
+        self.value = np.zeros(capacity, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def emit(self, position: Vec2, velocity: Vec2, life: float, value: int = 0):
+        if self.count >= self.capacity:
+            return
+        i = self.count
+        self.position[i] = position
+        self.velocity[i] = velocity
+        self.life[i] = life
+        self.value[i] = value
+        self.count += 1
+
+    def emit_many(self, positions, velocities, lives, values=0):
+        """ Emit a burst at once, the arguments are arrays (or anything numpy can broadcast) """
+        lives = np.asarray(lives, dtype=float).ravel()
+        n = min(len(lives), self.capacity - self.count)
+        if n <= 0:
+            return
+        start = self.count
+        end = start + n
+        self.position[start:end] = np.broadcast_to(positions, (len(lives), 2))[:n]
+        self.velocity[start:end] = np.broadcast_to(velocities, (len(lives), 2))[:n]
+        self.life[start:end] = lives[:n]
+        self.value[start:end] = np.broadcast_to(values, len(lives))[:n]
+        self.count = end
+
+    def update(self, dt: float):
+        n = self.count
+        if n == 0:
+            return
+        pos = self.position[:n]
+        vel = self.velocity[:n]
+        pos += vel * dt
+        vel *= 1 - self.drag * dt
+        vel += self.gravity * dt
+        self.life[:n] -= dt
+
+        dead = np.flatnonzero(self.life[:n] <= 0)
+        if len(dead) == 0:
+            return
+        # swap remove - the holes below the new count are filled with the live particles above it
+        new_count = n - len(dead)
+        holes = dead[dead < new_count]
+        tail = np.flatnonzero(self.life[new_count:n] > 0) + new_count
+        for arr in (self.position, self.velocity, self.life, self.value):
+            arr[holes] = arr[tail]
+        self.count = new_count
+
+    def clear(self):
+        self.count = 0
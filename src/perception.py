@@ -0,0 +1,76 @@
+import numpy as np
+import pymunk as pm
+
+# a bit bigger than the sight range, so a sight box never spans more than two cells
+CELL_SIZE = 64
+# combines the two cell coordinates into one key, the level is far smaller than this many cells
+KEY_STRIDE = 1 << 20
+
+class Perception():
+    """
+    Answers every NPC's "do I see the squid" question in one pass per tick.
+    The squid's shapes are hashed into a grid of CELL_SIZE cells, and only the sight boxes
+    that land in an occupied cell are tested against the shapes themselves, so NPCs far
+    from the squid cost a couple of array operations and no physics queries.
+
+    The sight boxes are taken at the start of the tick, before the NPCs update,
+    so an NPC that turns around sees in its new direction from the next tick on.
+    """
+    cell_size: float
+
+    def __init__(self, cell_size: float = CELL_SIZE):
+        self.cell_size = cell_size
+
+    def cell_keys(self, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        cx = np.floor(x / self.cell_size).astype(np.int64)
+        cy = np.floor(y / self.cell_size).astype(np.int64)
+        return cx * KEY_STRIDE + cy
+
+    def sees(self, sight_boxes: np.ndarray, targets: np.ndarray) -> np.ndarray:
+        """
+        sight_boxes and targets are arrays of (left, bottom, right, top) rows.
+        Returns a boolean array telling which sight boxes overlap any of the targets.
+        """
+        result = np.zeros(len(sight_boxes), dtype=bool)
+        if len(sight_boxes) == 0 or len(targets) == 0:
+            return result
+
+        # hash the targets into every cell they touch
+        t_left = np.floor(targets[:, 0] / self.cell_size).astype(np.int64)
+        t_right = np.floor(targets[:, 2] / self.cell_size).astype(np.int64)
+        t_bottom = np.floor(targets[:, 1] / self.cell_size).astype(np.int64)
+        t_top = np.floor(targets[:, 3] / self.cell_size).astype(np.int64)
+        span = max(int((t_right - t_left).max()), int((t_top - t_bottom).max())) + 1
+        offsets = np.arange(span)
+        cx = (t_left[:, None] + offsets[None, :]).clip(max=t_right[:, None])
+        cy = (t_bottom[:, None] + offsets[None, :]).clip(max=t_top[:, None])
+        occupied = np.unique((cx[:, :, None] * KEY_STRIDE + cy[:, None, :]).ravel())
+
+        # a sight box is smaller than a cell, so it touches at most its four corner cells
+        corners = np.stack((
+            self.cell_keys(sight_boxes[:, 0], sight_boxes[:, 1]),
+            self.cell_keys(sight_boxes[:, 2], sight_boxes[:, 1]),
+            self.cell_keys(sight_boxes[:, 0], sight_boxes[:, 3]),
+            self.cell_keys(sight_boxes[:, 2], sight_boxes[:, 3]),
+        ), axis=1)
+        candidates = np.flatnonzero(np.isin(corners, occupied).any(axis=1))
+        if len(candidates) == 0:
+            return result
+
+        # exact box overlap test for the few that share a cell with the squid
+        boxes = sight_boxes[candidates]
+        overlap = (boxes[:, None, 0] <= targets[None, :, 2]) & (boxes[:, None, 2] >= targets[None, :, 0]) & \
+            (boxes[:, None, 1] <= targets[None, :, 3]) & (boxes[:, None, 3] >= targets[None, :, 1])
+        result[candidates] = overlap.any(axis=1)
+        return result
+
+    def update(self, observers: list, target_shapes: list[pm.Shape]):
+        """
+        Set observer.sees_squid for every observer. Observers implement get_sight_bb().
+        """
+        if not observers:
+            return
+        sight_boxes = np.array([tuple(obs.get_sight_bb()) for obs in observers], dtype=float)
+        targets = np.array([tuple(shape.bb) for shape in target_shapes], dtype=float).reshape(-1, 4)
+        for obs, seen in zip(observers, self.sees(sight_boxes, targets).tolist()):
+            obs.sees_squid = seen
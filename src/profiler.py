@@ -0,0 +1,102 @@
+import time
+
+import numpy as np
+import pyray as pr
+
+# the phases of a frame, in the order they happen
+PHASES = ["input", "gameplay", "squid", "physics", "buoyancy", "perception", "objects", "particles", "render", "hud"]
+PHASE_COLORS = [pr.GRAY, pr.PURPLE, pr.PINK, pr.RED, pr.BLUE, pr.SKYBLUE, pr.ORANGE, pr.YELLOW, pr.GREEN, pr.LIME]
+# how many frames are kept, also the width of the graph in pixels
+HISTORY = 300
+TARGET_FRAME_TIME = 1 / 60
+
+class FrameProfiler():
+    """
+    Times the phases of every frame into a ring buffer.
+    The frame is split with lap(phase) calls - each one adds the time since the previous lap
+    (or the start of the frame) to that phase, so a phase that runs several times a frame
+    (like the physics during catch up) adds up. Laps are ignored while the profiler is disabled.
+
+    The time end_drawing waits for the frame limiter is not part of any phase.
+    """
+    enabled: bool
+    phase_index: dict[str, int]
+    samples: np.ndarray
+    current: np.ndarray
+    index: int
+    count: int
+    last: float
+
+    def __init__(self, history: int = HISTORY):
+        self.enabled = False
+        self.phase_index = {name: i for i, name in enumerate(PHASES)}
+        self.samples = np.zeros((history, len(PHASES)))
+        self.current = np.zeros(len(PHASES))
+        self.index = 0
+        self.count = 0
+        self.last = time.perf_counter()
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        # the frame that turns it on starts from here
+        self.begin_frame()
+
+    def begin_frame(self):
+        if not self.enabled:
+            return
+        self.current[:] = 0
+        self.last = time.perf_counter()
+
+    def lap(self, phase: str):
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self.current[self.phase_index[phase]] += now - self.last
+        self.last = now
+
+    def end_frame(self):
+        if not self.enabled:
+            return
+        self.samples[self.index] = self.current
+        self.index = (self.index + 1) % len(self.samples)
+        self.count = min(self.count + 1, len(self.samples))
+
+    def history(self) -> np.ndarray:
+        """ The recorded frames from oldest to newest, in seconds per phase """
+        if self.count < len(self.samples):
+            return self.samples[:self.count]
+        return np.roll(self.samples, -self.index, axis=0)
+
+    def percentiles(self) -> np.ndarray:
+        """ p50, p95 and p99 of the frame time """
+        if self.count == 0:
+            return np.zeros(3)
+        return np.percentile(self.history().sum(axis=1), [50, 95, 99])
+
+    def dump_csv(self, file: str):
+        with open(file, "w") as f:
+            f.write("frame," + ",".join(PHASES) + ",total\n")
+            for i, row in enumerate(self.history().tolist()):
+                f.write("%d,%s,%f\n" % (i, ",".join("%f" % (t * 1000) for t in row), sum(row) * 1000))
+
+    def draw(self, x: int, y: int, height: int = 100):
+        """ A stacked graph of the frame times, one pixel column per frame, with the target frame time as a line """
+        frames = self.history()
+        scale = height / (2 * TARGET_FRAME_TIME)
+        pr.draw_rectangle(x, y, len(self.samples), height, pr.fade(pr.BLACK, 0.6))
+        # stack the phases from the bottom up, cut off at the top of the graph
+        tops = np.minimum(np.cumsum(frames, axis=1) * scale, height).astype(int)
+        bottoms = np.zeros_like(tops)
+        bottoms[:, 1:] = tops[:, :-1]
+        columns, phases = np.nonzero(tops > bottoms)
+        for column, phase, bottom, top in zip(columns.tolist(), phases.tolist(), bottoms[columns, phases].tolist(), tops[columns, phases].tolist()):
+            pr.draw_rectangle(x + column, y + height - top, 1, top - bottom, PHASE_COLORS[phase])
+        target_y = y + height - int(TARGET_FRAME_TIME * scale)
+        pr.draw_line(x, target_y, x + len(self.samples), target_y, pr.WHITE)
+
+        p50, p95, p99 = (self.percentiles() * 1000).tolist()
+        pr.draw_text("p50 %.2f ms  p95 %.2f ms  p99 %.2f ms" % (p50, p95, p99), x, y + height + 4, 10, pr.WHITE)
+        means = frames.mean(axis=0) * 1000 if len(frames) else np.zeros(len(PHASES))
+        for i, (name, mean) in enumerate(zip(PHASES, means.tolist())):
+            pr.draw_rectangle(x + len(self.samples) + 8, y + i * 10 + 1, 8, 8, PHASE_COLORS[i])
+            pr.draw_text("%s %.2f" % (name, mean), x + len(self.samples) + 20, y + i * 10, 10, pr.WHITE)
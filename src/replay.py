@@ -0,0 +1,161 @@
+"""
+Records the player's inputs and plays them back without a window.
+Record a session by starting the game with
+
+    python src/main.py --record session.rpl
+
+and replay it from the repository root with
+
+    python src/replay.py session.rpl
+    python src/replay.py session.rpl --profile
+
+The world is created right after seeding the global random module with the seed from the file,
+and every frame is stepped with the recorded dt and inputs, so the replay runs the exact same
+simulation as the recorded session. It prints a digest of the final state, which should stay the
+same between runs unless the simulation changed. The game stores the digest of the session's final
+state when it closes the recording, the replay checks its own against it and exits with status 1
+if they differ - rendering (or anything else the game does around the steps) changed the simulation.
+
+A recording is a 16 byte header (magic, version as little endian uint32, seed as uint64)
+followed by one 13 byte row per frame the world was stepped: dt, mouse x, mouse y as float32
+and the buttons as a bit mask. raylib reports the frame time and mouse position as float32,
+so nothing is lost by storing them that way. A closed recording ends with a 32 byte footer
+(magic, the sha1 state digest, frame count as uint64), a crashed one has none.
+"""
+import io
+import os
+import sys
+import time
+import random
+import struct
+import hashlib
+import argparse
+
+import numpy as np
+from pymunk.vec2d import Vec2d as Vec2
+
+from world import World, Inputs, load_headless_game_data
+from walls import load_level_walls
+
+MAGIC = b"SQRP"
+VERSION = 2
+HEADER = struct.Struct("<4sIQ")
+FOOTER_MAGIC = b"SQDG"
+FOOTER = struct.Struct("<4s20sQ")
+FRAME_DTYPE = np.dtype([("dt", "<f4"), ("mouse_x", "<f4"), ("mouse_y", "<f4"), ("buttons", "u1")])
+LEFT_DOWN = 1
+RIGHT_DOWN = 2
+SPAWN_FISH = 4
+
+def new_seed() -> int:
+    return int.from_bytes(os.urandom(8), "little")
+
+def seeded_world(game_data: dict, walls: list[list[float]], seed: int) -> World:
+    """ Seed the random module and create the world, the same way for recording and playing back """
+    random.seed(seed)
+    return World(game_data, walls)
+
+class Recorder():
+    """
+    Writes the inputs of every world step to a file.
+    The rows are written as they come, so a recording is still readable if the game crashes.
+    """
+    file: io.BufferedWriter
+    seed: int
+    frames: int
+
+    def __init__(self, file: str, seed: int):
+        self.file = open(file, "wb")
+        self.file.write(HEADER.pack(MAGIC, VERSION, seed))
+        self.seed = seed
+        self.frames = 0
+
+    def record(self, dt: float, inputs: Inputs):
+        row = np.zeros(1, dtype=FRAME_DTYPE)
+        row["dt"] = dt
+        row["mouse_x"] = inputs.mouse_pos.x
+        row["mouse_y"] = inputs.mouse_pos.y
+        row["buttons"] = (LEFT_DOWN if inputs.left_down else 0) | (RIGHT_DOWN if inputs.right_down else 0) | \
+            (SPAWN_FISH if inputs.spawn_fish else 0)
+        self.file.write(row.tobytes())
+        self.frames += 1
+
+    def close(self, digest: str = None):
+        """ Finish the file, with the state_digest of the world after the last recorded step if there is one """
+        if digest is not None:
+            self.file.write(FOOTER.pack(FOOTER_MAGIC, bytes.fromhex(digest), self.frames))
+        self.file.close()
+
+def load_replay(file: str) -> tuple[int, np.ndarray, str]:
+    """ The seed, the recorded frames and the digest of the final state, None if the recording has none """
+    with open(file, "rb") as f:
+        magic, version, seed = HEADER.unpack(f.read(HEADER.size))
+        data = f.read()
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("%s is not a version %d recording" % (file, VERSION))
+    digest = None
+    if len(data) >= FOOTER.size:
+        footer_magic, footer_digest, frames = FOOTER.unpack(data[-FOOTER.size:])
+        if footer_magic == FOOTER_MAGIC and frames * FRAME_DTYPE.itemsize == len(data) - FOOTER.size:
+            digest = footer_digest.hex()
+            data = data[:-FOOTER.size]
+    # a crash can leave half a row at the end
+    count = len(data) // FRAME_DTYPE.itemsize
+    return seed, np.frombuffer(data, dtype=FRAME_DTYPE, count=count), digest
+
+def frame_inputs(frames: np.ndarray) -> list[tuple[float, Inputs]]:
+    """ The dt and inputs of every frame, built up front so playing back only runs the simulation """
+    return [(dt, Inputs(Vec2(x, y), bool(buttons & LEFT_DOWN), bool(buttons & RIGHT_DOWN), bool(buttons & SPAWN_FISH)))
+            for dt, x, y, buttons in frames.tolist()]
+
+def play(world: World, inputs: list[tuple[float, Inputs]]):
+    for dt, frame in inputs:
+        world.step(dt, frame)
+
+def state_digest(world: World) -> str:
+    """ A hash of every body's position, angle and velocity and the points """
+    h = hashlib.sha1()
+    for body in world.space.bodies:
+        h.update(struct.pack("<6d", body.position.x, body.position.y, body.angle,
+                             body.velocity.x, body.velocity.y, body.angular_velocity))
+    h.update(struct.pack("<q", world.point_total))
+    return h.hexdigest()
+
+def main():
+    parser = argparse.ArgumentParser(description="Play back a recorded session without a window")
+    parser.add_argument("file", help="the recording")
+    parser.add_argument("--profile", action="store_true", help="run the playback under cProfile")
+    parser.add_argument("--sort", default="cumulative", help="cProfile sort order")
+    parser.add_argument("--limit", type=int, default=30, help="how many cProfile rows to print")
+    parser.add_argument("--res", default="res", help="resource directory")
+    args = parser.parse_args()
+
+    seed, frames, recorded_digest = load_replay(args.file)
+    world = seeded_world(load_headless_game_data(args.res), load_level_walls(args.res), seed)
+    inputs = frame_inputs(frames)
+
+    start = time.perf_counter()
+    if args.profile:
+        import cProfile
+        import pstats
+        profile = cProfile.Profile()
+        profile.runcall(play, world, inputs)
+        elapsed = time.perf_counter() - start
+        pstats.Stats(profile, stream=sys.stdout).sort_stats(args.sort).print_stats(args.limit)
+    else:
+        play(world, inputs)
+        elapsed = time.perf_counter() - start
+
+    print("%d frames, %d ticks in %.3f s (%.1f us/tick)" % (len(frames), world.tick_count, elapsed,
+                                                           elapsed / max(world.tick_count, 1) * 1e6))
+    print("points %d, squid at (%.3f, %.3f)" % (world.point_total, world.squid.body.position.x, world.squid.body.position.y))
+    digest = state_digest(world)
+    print("digest %s" % digest)
+    if recorded_digest is not None:
+        if digest != recorded_digest:
+            print("the recorded session ended in a different state, digest %s" % recorded_digest)
+            sys.exit(1)
+        print("same final state as the recorded session")
+
+if __name__ == "__main__":
+    main()
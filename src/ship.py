@@ -7,7 +7,9 @@ from pymunk.vec2d import Vec2d as Vec2
 
 from human import Human
 
-from utils import calc_boyancy, SHIP_CATEGORY, SHIP_HULL_GROUP
+from utils import body_bb, Transform, SHIP_CATEGORY, SHIP_HULL_GROUP
+import sprite_batch as sprites
+from sprite_batch import LAYER_SHIPS
 
 
 class Ship():
@@ -15,7 +17,8 @@ class Ship():
     body: pm.Body
     humans: list[Human]
 
-    def __init__(self, game_data: dict, position: Vec2, space: pm.Space, decks: list[tuple[float, float]]):
+    def __init__(self, game_data: dict, position: Vec2, space: pm.Space, decks: list[tuple[float, float]],
+                 crew: list[dict] = None):
         self.texture = game_data["textures"]["boat"]
         self.body = pm.Body()
         self.body.position = position
@@ -41,15 +44,23 @@ class Ship():
         weight_shape.filter = pm.ShapeFilter(group=SHIP_HULL_GROUP, categories=SHIP_CATEGORY)
 
         space.add(self.body, body_shape, weight_shape)
+        self.body.buoyancy = (0, Vec2(0, 0))
 
         self.humans = []
-        for i in range(random.randint(2, 4)):
-            self.humans.append(
-                Human(game_data, 
-                    Vec2(position.x - hull_size.x/2.2 + random.random() * hull_size.x*0.8, 
-                        position.y - hull_size.y/2), 
-                space)
-            )
+        if crew is not None:
+            # a ship that was saved keeps the crew it had
+            for state in crew:
+                human = Human(game_data, Vec2(*state["position"]), space)
+                human.set_state(state)
+                self.humans.append(human)
+        else:
+            for i in range(random.randint(2, 4)):
+                self.humans.append(
+                    Human(game_data, 
+                        Vec2(position.x - hull_size.x/2.2 + random.random() * hull_size.x*0.8, 
+                            position.y - hull_size.y/2), 
+                    space)
+                )
     
     def update(self, dt: float):
         # apply drag
@@ -57,8 +68,8 @@ class Ship():
         self.body.angular_velocity *= 1-(3 * dt)
         # apply gravity
         self.body.apply_force_at_world_point(Vec2(0, 6000 * dt * self.body.mass),  self.body.position)
-        # apply buoyancy
-        area, center = calc_boyancy(self.body)
+        # apply buoyancy, computed for all floating bodies at once by the world's BuoyancySystem
+        area, center = self.body.buoyancy
         force = Vec2(0, area * -60 * dt)
         self.body.apply_force_at_world_point(force, center)
 
@@ -67,13 +78,42 @@ class Ship():
         for human in self.humans:
             human.update(dt)
             
-    def draw(self, mouse_pos: Vec2):
+    def get_state(self) -> dict:
+        """ The ship and its crew as plain data, Ship(..., crew=state["crew"]) and set_state bring it back """
+        return {
+            "position": tuple(self.body.position),
+            "angle": self.body.angle,
+            "velocity": tuple(self.body.velocity),
+            "angular_velocity": self.body.angular_velocity,
+            "crew": [human.get_state() for human in self.humans],
+        }
+
+    def set_state(self, state: dict):
+        self.body.angle = state["angle"]
+        self.body.position = state["position"]
+        self.body.velocity = state["velocity"]
+        self.body.angular_velocity = state["angular_velocity"]
+
+    def get_bodies(self) -> list[pm.Body]:
+        return [self.body] + [human.body for human in self.humans]
+
+    def get_bb(self) -> pm.BB:
+        """ The bounding box of the ship together with its crew, since they are drawn with it """
+        bb = body_bb(self.body)
+        for human in self.humans:
+            bb = bb.merge(human.get_bb())
+        return bb
+
+    def draw(self, mouse_pos: Vec2, transform: Transform):
+        """ transform gives the position and angle to draw a body at """
         for human in self.humans:
-            human.draw(mouse_pos)
-        pr.draw_texture_pro(self.texture, 
+            human.draw(mouse_pos, transform)
+        position, angle = transform(self.body)
+        sprites.draw_texture_pro(self.texture, 
             (0, 0, self.texture.width, self.texture.height),
-            (self.body.position.x, self.body.position.y, self.texture.width * 2, self.texture.height * 2),
+            (position.x, position.y, self.texture.width * 2, self.texture.height * 2),
             (self.texture.width, self.texture.height),
-            self.body.angle * 180 / math.pi,
-            pr.WHITE
+            angle * 180 / math.pi,
+            pr.WHITE,
+            layer=LAYER_SHIPS
         )
\ No newline at end of file
@@ -0,0 +1,111 @@
+import random
+
+import pymunk as pm
+from pymunk.vec2d import Vec2d as Vec2
+
+from ship import Ship
+from buoyancy import BuoyancySystem
+from dormancy import Dormancy
+from lifecycle import Lifecycle
+
+# the level is split into columns this wide
+SHIP_CHUNK_WIDTH = 1000
+# a column's ships are created when the squid is this close to it, and saved when it is further than UNLOAD_DISTANCE.
+# both are beyond the dormancy radii, so ships are asleep by the time they are saved
+LOAD_DISTANCE = 1200
+UNLOAD_DISTANCE = 1600
+# ships are placed along these x ranges, a random distance apart
+SHIP_RANGES = [(100, 2100), (4500, 7200)]
+SHIP_SPACING = (200, 500)
+SHIP_Y = -4
+
+def ship_layout(first: Vec2, ranges: list[tuple[float, float]] = SHIP_RANGES) -> list[Vec2]:
+    """ Where the ships of the level start, only positions, so a long level costs next to nothing """
+    positions = [first]
+    for start, end in ranges:
+        x = start
+        while x < end:
+            x += random.randint(*SHIP_SPACING)
+            positions.append(Vec2(x, SHIP_Y))
+    return positions
+
+class ShipChunks():
+    """
+    Keeps only the ships near the squid in the world.
+    A ship belongs to the column it starts in. When the squid gets close to a column its ships are
+    created, when it leaves they are saved as plain data (see Ship.get_state) and taken out of the space.
+    Saved ships come back the way they were left, so eaten crew stay eaten and drowned crew stay dead.
+    A ship that was never loaded is only a position, it gets its crew when it first loads.
+    """
+    space: pm.Space
+    game_data: dict
+    buoyancy: BuoyancySystem
+    dormancy: Dormancy
+    lifecycle: Lifecycle
+    width: float
+    # the ships of every column that isn't loaded, either a saved state or {"position": (x, y)}
+    saved: dict[int, list[dict]]
+    loaded: dict[int, list[Ship]]
+
+    def __init__(self, space: pm.Space, game_data: dict, buoyancy: BuoyancySystem, dormancy: Dormancy,
+                 lifecycle: Lifecycle, positions: list[Vec2], width: float = SHIP_CHUNK_WIDTH):
+        self.space = space
+        self.game_data = game_data
+        self.buoyancy = buoyancy
+        self.dormancy = dormancy
+        self.lifecycle = lifecycle
+        self.width = width
+        self.saved = {}
+        self.loaded = {}
+        for position in positions:
+            self.saved.setdefault(self.chunk_of(position.x), []).append({"position": tuple(position)})
+
+    def chunk_of(self, x: float) -> int:
+        return int(x // self.width)
+
+    def distance(self, index: int, x: float) -> float:
+        """ How far x is from the column """
+        return max(index * self.width - x, x - (index + 1) * self.width, 0)
+
+    def update(self, x: float, game_objects: list, caught: list):
+        """ Load the columns that came within reach of x and save the ones that are too far. Nothing caught is saved """
+        for index in range(self.chunk_of(x - LOAD_DISTANCE), self.chunk_of(x + LOAD_DISTANCE) + 1):
+            if index in self.saved:
+                self.load(index, game_objects)
+        for index in [i for i in self.loaded if self.distance(i, x) > UNLOAD_DISTANCE]:
+            self.unload(index, game_objects, caught)
+
+    def load(self, index: int, game_objects: list):
+        ships = []
+        for state in self.saved.pop(index):
+            ship = Ship(self.game_data, Vec2(*state["position"]), self.space, [], state.get("crew"))
+            if "crew" in state:
+                ship.set_state(state)
+            self.buoyancy.add(ship.body)
+            for human in ship.humans:
+                self.buoyancy.add(human.body)
+            ships.append(ship)
+            game_objects.append(ship)
+        self.loaded[index] = ships
+
+    def unload(self, index: int, game_objects: list, caught: list):
+        ships = self.loaded[index]
+        # the squid can carry a human far from its ship, the column waits until it's let go
+        held = {shape.body for shape in caught if shape is not None}
+        if any(human.body in held for ship in ships for human in ship.humans):
+            return
+        states = []
+        for ship in ships:
+            states.append(ship.get_state())
+            # dormant ships sleep as one group with their crew, chipmunk can't take a group apart while it sleeps
+            if self.dormancy.is_dormant(ship):
+                self.dormancy.wake(ship, ship.get_bodies())
+            for human in list(ship.humans):
+                self.lifecycle.despawn(human, ship.humans)
+            self.lifecycle.despawn(ship, game_objects)
+        self.saved[index] = states
+        del self.loaded[index]
+
+    def ship_count(self) -> tuple[int, int]:
+        """ (loaded, saved) ships """
+        return sum(len(s) for s in self.loaded.values()), sum(len(s) for s in self.saved.values())
@@ -0,0 +1,167 @@
+from collections import deque
+import math
+import random
+
+import numpy as np
+from pymunk.vec2d import Vec2d as Vec2
+
+# the level is split into cells this big
+SPAWN_CELL = 16
+# how far a spawned fish has to be from the walls
+WALL_CLEARANCE = 10
+# free cells have to be this far below the surface, so fish don't spawn in the ships' hulls
+SURFACE_MARGIN = 16
+# fish are counted in cells this big, and no fish spawn in a cell that has more than MAX_CELL_FISH
+DENSITY_CELL = 400
+MAX_CELL_FISH = 3
+
+def segment_distances(xs: np.ndarray, ys: np.ndarray, a: tuple[float, float], b: tuple[float, float]) -> np.ndarray:
+    """ Distances of the grid of points from the segment a-b, xs is a row and ys a column """
+    dx = b[0] - a[0]
+    dy = b[1] - a[1]
+    length2 = dx*dx + dy*dy
+    px = xs - a[0]
+    py = ys - a[1]
+    if length2 == 0:
+        return np.sqrt(px*px + py*py)
+    t = np.clip((px*dx + py*dy) / length2, 0, 1)
+    ex = px - t*dx
+    ey = py - t*dy
+    return np.sqrt(ex*ex + ey*ey)
+
+class SpawnMap():
+    """
+    Where fish may spawn in the level, worked out once from the walls.
+    A cell is free if no wall comes close to it, it is far enough below the surface,
+    and it can be reached from the squid's start without crossing a wall (the inside of the rocks can't).
+    The free cells are indexed by the DENSITY_CELL sized cell they are in, so a spawn only looks at
+    the free cells around it and skips the crowded ones without counting anything.
+    It only knows the walls, the world still checks a spawn point against the bodies there.
+    """
+    origin: Vec2
+    cell: float
+    cols: int
+    rows: int
+    free: np.ndarray
+    # the centre of every free cell
+    free_x: np.ndarray
+    free_y: np.ndarray
+    # (row, column) of a density cell -> indices into free_x and free_y of the free cells inside it
+    buckets: dict[tuple[int, int], np.ndarray]
+
+    def __init__(self, walls: list[list[float]], level_rect: tuple[float, float, float, float], start: Vec2,
+                 cell: float = SPAWN_CELL):
+        self.origin = Vec2(level_rect[0], level_rect[1])
+        self.cell = cell
+        self.cols = int(level_rect[2] // cell)
+        self.rows = int(level_rect[3] // cell)
+
+        # a cell is blocked if a wall passes closer to its centre than the clearance from its corners
+        xs = self.origin.x + (np.arange(self.cols) + 0.5) * cell
+        ys = (self.origin.y + (np.arange(self.rows) + 0.5) * cell)[:, None]
+        reach = WALL_CLEARANCE * 2**0.5 + cell / 2**0.5
+        blocked = np.zeros((self.rows, self.cols), dtype=bool)
+        for x1, y1, x2, y2 in walls:
+            c0, c1 = np.searchsorted(xs, (min(x1, x2) - reach, max(x1, x2) + reach))
+            r0, r1 = np.searchsorted(ys[:, 0], (min(y1, y2) - reach, max(y1, y2) + reach))
+            if c0 < c1 and r0 < r1:
+                blocked[r0:r1, c0:c1] |= segment_distances(xs[c0:c1], ys[r0:r1], (x1, y1), (x2, y2)) < reach
+
+        # everything the squid can swim (or jump) to from where it starts
+        reachable = np.zeros_like(blocked)
+        start_cell = self.cell_of(start)
+        if start_cell is not None and not blocked[start_cell]:
+            reachable[start_cell] = True
+            queue = deque([start_cell])
+            while queue:
+                r, c = queue.popleft()
+                for nr, nc in ((r - 1, c), (r + 1, c), (r, c - 1), (r, c + 1)):
+                    if 0 <= nr < self.rows and 0 <= nc < self.cols and not blocked[nr, nc] and not reachable[nr, nc]:
+                        reachable[nr, nc] = True
+                        queue.append((nr, nc))
+        below_surface = (self.origin.y + np.arange(self.rows) * cell >= SURFACE_MARGIN)[:, None]
+        self.free = reachable & below_surface
+
+        rows, cols = np.nonzero(self.free)
+        self.free_x = self.origin.x + (cols + 0.5) * cell
+        self.free_y = self.origin.y + (rows + 0.5) * cell
+        density_cols = int(-(-level_rect[2] // DENSITY_CELL))
+        keys = ((self.free_y - self.origin.y) // DENSITY_CELL).astype(np.int64) * density_cols + \
+            ((self.free_x - self.origin.x) // DENSITY_CELL).astype(np.int64)
+        order = np.argsort(keys, kind="stable")
+        unique, starts = np.unique(keys[order], return_index=True)
+        self.buckets = {divmod(int(key), density_cols): indices
+                        for key, indices in zip(unique.tolist(), np.split(order, starts[1:]))}
+
+    def cell_of(self, position: Vec2) -> tuple[int, int]:
+        """ (row, column) of the position, None outside the level """
+        col = int((position.x - self.origin.x) // self.cell)
+        row = int((position.y - self.origin.y) // self.cell)
+        if 0 <= row < self.rows and 0 <= col < self.cols:
+            return row, col
+        return None
+
+    def cells_in_cone(self, apex: Vec2, direction: Vec2, near: float, far: float, spread: float,
+                      density: "FishDensity") -> np.ndarray:
+        """
+        The free cells whose centre is between near and far from the apex and at most spread radians
+        off the direction, leaving out the crowded density cells
+        """
+        corners = [apex + direction.rotated(angle) * distance for angle in (-spread, spread) for distance in (near, far)]
+        corners.append(apex + direction * far)
+        r0, c0 = density.clamped_cell_of(Vec2(min(p.x for p in corners), min(p.y for p in corners)))
+        r1, c1 = density.clamped_cell_of(Vec2(max(p.x for p in corners), max(p.y for p in corners)))
+        found = [self.buckets[(r, c)] for r in range(r0, r1 + 1) for c in range(c0, c1 + 1)
+                 if (r, c) in self.buckets and density.counts[r, c] <= MAX_CELL_FISH]
+        if not found:
+            return np.zeros(0, dtype=np.int64)
+        indices = np.concatenate(found)
+        dx = self.free_x[indices] - apex.x
+        dy = self.free_y[indices] - apex.y
+        distance = np.sqrt(dx*dx + dy*dy)
+        inside = (distance >= near) & (distance <= far) & (dx*direction.x + dy*direction.y >= distance * math.cos(spread))
+        return indices[inside]
+
+    def spawn_position(self, index: int) -> Vec2:
+        """ A random point in the free cell """
+        return Vec2(self.free_x[index] + (random.random() - 0.5) * self.cell,
+                    self.free_y[index] + (random.random() - 0.5) * self.cell)
+
+class FishDensity():
+    """
+    How many fish there are in every DENSITY_CELL sized cell of the level.
+    Spawning adds to the count right away, the world recounts every fish now and then as they swim around.
+    """
+    origin: Vec2
+    cols: int
+    rows: int
+    counts: np.ndarray
+
+    def __init__(self, level_rect: tuple[float, float, float, float]):
+        self.origin = Vec2(level_rect[0], level_rect[1])
+        self.cols = int(-(-level_rect[2] // DENSITY_CELL))
+        self.rows = int(-(-level_rect[3] // DENSITY_CELL))
+        self.counts = np.zeros((self.rows, self.cols), dtype=np.int32)
+
+    def cell_of(self, position: Vec2) -> tuple[int, int]:
+        col = int((position.x - self.origin.x) // DENSITY_CELL)
+        row = int((position.y - self.origin.y) // DENSITY_CELL)
+        if 0 <= row < self.rows and 0 <= col < self.cols:
+            return row, col
+        return None
+
+    def clamped_cell_of(self, position: Vec2) -> tuple[int, int]:
+        """ (row, column) of the position, the closest cell for one outside the level """
+        col = int((position.x - self.origin.x) // DENSITY_CELL)
+        row = int((position.y - self.origin.y) // DENSITY_CELL)
+        return min(max(row, 0), self.rows - 1), min(max(col, 0), self.cols - 1)
+
+    def recount(self, positions: list[Vec2]):
+        self.counts[:] = 0
+        for position in positions:
+            self.add(position)
+
+    def add(self, position: Vec2):
+        cell = self.cell_of(position)
+        if cell is not None:
+            self.counts[cell] += 1
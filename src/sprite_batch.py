@@ -0,0 +1,159 @@
+"""
+Collects the sprites of a frame and draws them sorted by layer and texture.
+
+The game objects draw through the module level draw_texture_pro and draw_rectangle_pro,
+which take the same arguments as the pyray functions plus a layer, and draw_strip for
+textured strips of quads (like the squid's limbs).
+Between begin() and end() the calls are recorded instead of drawn, and end() submits them
+so that every texture is bound as few times as possible. With the sprites packed into the
+atlas (see atlas.py) a whole layer ends up in a single raylib batch.
+Outside of begin() and end() everything is drawn immediately.
+"""
+import pyray as pr
+
+from atlas import AtlasSprite
+
+# layers are drawn from the lowest to the highest, in the order the game used to draw them
+LAYER_BACKGROUND = 0
+LAYER_SQUID = 10
+LAYER_SQUID_EYES = 11
+# the ships and their crews
+LAYER_SHIPS = 20
+LAYER_FISH = 21
+LAYER_WATER = 30
+# these layers are drawn in the order of the calls instead of by texture, every ship's crew has to be
+# drawn right before its hull, or the hull of the ship next to it could end up over them.
+# with the atlas all of them share a texture, so they are still a single batch
+ORDERED_LAYERS = {LAYER_SHIPS}
+
+# from rlgl.h, pyray doesn't export the primitive types
+RL_QUADS = 0x0007
+
+# kinds of draw commands
+SPRITE = 0
+RECTANGLE = 1
+STRIP = 2
+
+def texture_uvs(texture, coords: list[tuple[float, float, float]]) -> list[tuple[float, float, float]]:
+    """
+    Turn (left u, right u, v) rows in pixels of the texture into texture coordinates.
+    Works with atlas sprites, so the result can be computed once and drawn every frame.
+    """
+    x = y = 0
+    if isinstance(texture, AtlasSprite):
+        x, y = texture.x, texture.y
+        texture = texture.texture
+    return [((x + ul) / texture.width, (x + ur) / texture.width, (y + v) / texture.height) for ul, ur, v in coords]
+
+def strip_now(texture, uvs: list[tuple[float, float, float]], vertices: list[tuple[float, float, float, float]], tint: pr.Color):
+    """
+    Draw a strip of quads. vertices are (left x, left y, right x, right y) rows along the strip
+    and uvs the matching texture coordinates, neighbouring quads share their edge so there are no gaps.
+    """
+    if isinstance(texture, AtlasSprite):
+        texture = texture.texture
+    pr.rl_check_render_batch_limit(4 * (len(vertices) - 1))
+    pr.rl_set_texture(texture.id)
+    pr.rl_begin(RL_QUADS)
+    pr.rl_color4ub(tint[0], tint[1], tint[2], tint[3])
+    pr.rl_normal3f(0.0, 0.0, 1.0)
+    for (lx0, ly0, rx0, ry0), (lx1, ly1, rx1, ry1), (ul0, ur0, v0), (ul1, ur1, v1) in zip(vertices, vertices[1:], uvs, uvs[1:]):
+        # same winding as draw_texture_pro, down the left side and up the right side
+        pr.rl_tex_coord2f(ul0, v0)
+        pr.rl_vertex2f(lx0, ly0)
+        pr.rl_tex_coord2f(ul1, v1)
+        pr.rl_vertex2f(lx1, ly1)
+        pr.rl_tex_coord2f(ur1, v1)
+        pr.rl_vertex2f(rx1, ry1)
+        pr.rl_tex_coord2f(ur0, v0)
+        pr.rl_vertex2f(rx0, ry0)
+    pr.rl_end()
+    pr.rl_set_texture(0)
+
+def texture_key(layer: int, texture_id: int) -> int:
+    """ What the commands of a layer are sorted by before their order """
+    return 0 if layer in ORDERED_LAYERS else texture_id
+
+class SpriteBatch():
+    # (layer, texture id or 0 in an ordered layer, order, kind, texture, arguments)
+    commands: list[tuple]
+    # statistics of the last submitted frame
+    sprites: int
+    texture_switches: int
+
+    def __init__(self):
+        self.commands = []
+        self.sprites = 0
+        self.texture_switches = 0
+
+    def add(self, layer: int, texture, source, dest, origin, rotation: float, tint: pr.Color):
+        if texture is None:
+            self.commands.append((layer, texture_key(layer, -1), len(self.commands), RECTANGLE, None, (dest, origin, rotation, tint)))
+            return
+        if isinstance(texture, AtlasSprite):
+            # source rectangles are relative to the sprite, move them into the atlas
+            source = (source[0] + texture.x, source[1] + texture.y, source[2], source[3])
+            texture = texture.texture
+        self.commands.append((layer, texture_key(layer, texture.id), len(self.commands), SPRITE, texture, (source, dest, origin, rotation, tint)))
+
+    def add_strip(self, layer: int, texture, uvs, vertices, tint: pr.Color):
+        if isinstance(texture, AtlasSprite):
+            texture = texture.texture
+        self.commands.append((layer, texture_key(layer, texture.id), len(self.commands), STRIP, texture, (uvs, vertices, tint)))
+
+    def submit(self):
+        # sorting by the order last keeps the draw order within a layer for the same texture
+        self.commands.sort(key=lambda c: (c[0], c[1], c[2]))
+        last_tex = None
+        switches = 0
+        for _, _, _, kind, texture, args in self.commands:
+            tex_id = -1 if texture is None else texture.id
+            if tex_id != last_tex:
+                switches += 1
+                last_tex = tex_id
+            if kind == SPRITE:
+                pr.draw_texture_pro(texture, *args)
+            elif kind == RECTANGLE:
+                pr.draw_rectangle_pro(*args)
+            else:
+                strip_now(texture, *args)
+        self.sprites = len(self.commands)
+        self.texture_switches = switches
+        self.commands.clear()
+
+current: SpriteBatch = None
+
+def begin(batch: SpriteBatch):
+    """ Start recording draw calls into the batch """
+    global current
+    current = batch
+
+def end():
+    """ Draw everything recorded since begin() """
+    global current
+    batch = current
+    current = None
+    if batch is not None:
+        batch.submit()
+
+def draw_texture_pro(texture, source, dest, origin, rotation: float, tint: pr.Color, layer: int = LAYER_BACKGROUND):
+    if current is not None:
+        current.add(layer, texture, source, dest, origin, rotation, tint)
+        return
+    if isinstance(texture, AtlasSprite):
+        source = (source[0] + texture.x, source[1] + texture.y, source[2], source[3])
+        texture = texture.texture
+    pr.draw_texture_pro(texture, source, dest, origin, rotation, tint)
+
+def draw_strip(texture, uvs, vertices, tint: pr.Color, layer: int = LAYER_BACKGROUND):
+    """ Draw a textured strip, see strip_now. The uvs come from texture_uvs """
+    if current is not None:
+        current.add_strip(layer, texture, uvs, vertices, tint)
+        return
+    strip_now(texture, uvs, vertices, tint)
+
+def draw_rectangle_pro(rec, origin, rotation: float, color: pr.Color, layer: int = LAYER_BACKGROUND):
+    if current is not None:
+        current.add(layer, None, None, rec, origin, rotation, color)
+        return
+    pr.draw_rectangle_pro(rec, origin, rotation, color)
@@ -1,12 +1,15 @@
 import math
 
+import numpy as np
 import pyray as pr
 import pymunk as pm
 from pymunk.vec2d import Vec2d as Vec2
 
 from fish import FISH_CATEGORY, FISH_GROUP
 from human import  HUMAN_CATEGORY, HUMAN_GROUP
-from utils import SQUID_CATEGORY, SQUID_SHAPE_GROUP
+from utils import Transform, SQUID_CATEGORY, SQUID_SHAPE_GROUP
+import sprite_batch as sprites
+from sprite_batch import LAYER_SQUID, LAYER_SQUID_EYES
 
 # a pose is a list of lists of tuples
 # the elements of the outer list are the tentacles
@@ -45,6 +48,12 @@ BALANCE_POSE: Pose = [[
         for j in range(N_TENTACLE_SEGMENTS)
     ] for i in range(N_TENTACLES)]
 DEFAULT_DAMPING = 1500
+# spring strength of the short tentacles' first segments, the later ones are weaker
+TENTACLE_STIFFNESS = 5000
+# how much the joints may stretch beyond the length of the squid
+EXTENT_SLACK = 16
+# how far the tentacles wiggle around the pose
+WIGGLE_ANGLE = 5 * (2*math.pi/360)
 
 # Class for the main character - the squid
 class Squid():
@@ -63,7 +72,33 @@ class Squid():
 
     caught: list
 
-    def __init__(self, game_data: dict, position: Vec2, space: pm.Space):
+    # every body of the squid and their masses, the bodies never change after creation
+    bodies: list[pm.Body]
+    body_masses: list[float]
+    shapes: list[pm.Shape]
+    # no body is further than this from the main body
+    extent: float
+    # the short tentacles' segments flattened in tentacle order, with the arrays the controller works on
+    tentacle_bodies: list[pm.Body]
+    tentacle_motors: list[pm.SimpleMotor]
+    motor_rates: np.ndarray
+    pose_angles: np.ndarray
+    wiggle_div: np.ndarray
+    wiggle_phase: np.ndarray
+    parent_angles: np.ndarray
+    ltentacle_bodies: list[pm.Body]
+    # the sections the limbs are drawn through. Each one is the average of a point on body a
+    # and a point on body b (indices into bodies, at a local y), with a half width
+    section_a: np.ndarray
+    section_ay: np.ndarray
+    section_b: np.ndarray
+    section_by: np.ndarray
+    section_half_width: np.ndarray
+    # (texture, texture coordinates, first section, end section) of every limb
+    limbs: list[tuple]
+
+    def __init__(self, game_data: dict, position: Vec2, space: pm.Space,
+                 stiffness: float = TENTACLE_STIFFNESS, damping: float = DEFAULT_DAMPING):
         base_segment_size = Vec2(32, 16)
         self.body_texture = game_data["textures"]["squid_body"]
         self.tentacle_texture = game_data["textures"]["squid_tentacle"]
@@ -122,10 +157,10 @@ class Squid():
                 t_shape.friction = 0.1
                 t_shape.filter = pm.ShapeFilter(group=SQUID_SHAPE_GROUP, categories=SQUID_CATEGORY)
                 t_joint = pm.PivotJoint(last_body, t_body, last_anchor, (0, -t_size.y/2))
-                (angle, strength) = (DEFAULT_POSE[i][j], 5000)
+                (angle, strength) = (DEFAULT_POSE[i][j], stiffness)
                 
                 str_mul = [1.0, 0.5, 0.3, 0.2, 0.1, 0.0][j]
-                t_rotary_spring = pm.DampedRotarySpring(last_body, t_body, angle, strength * str_mul, DEFAULT_DAMPING * str_mul)
+                t_rotary_spring = pm.DampedRotarySpring(last_body, t_body, angle, strength * str_mul, damping * str_mul)
 
                 # limit the angle of the tentacle segment
                 t_rotary_limit = pm.RotaryLimitJoint(last_body, t_body, 
@@ -163,7 +198,7 @@ class Squid():
                 (angle, strength) = (0, 1000)
 
                 str_mul = [1.0, 0.8, 0.5, 0.4, 0.4, 0.4, 0.4, 0.0][j]
-                t_rotary_spring = pm.DampedRotarySpring(last_body, t_body, angle, strength * str_mul, DEFAULT_DAMPING * str_mul)
+                t_rotary_spring = pm.DampedRotarySpring(last_body, t_body, angle, strength * str_mul, damping * str_mul)
 
                 # limit the angle of the tentacle segment
                 t_rotary_limit = pm.RotaryLimitJoint(last_body, t_body, 
@@ -183,50 +218,109 @@ class Squid():
 
             self.ltentacles.append(tentacle)
 
-    def update(self, dt: float):
-        # set the tentacles' motor rates depending on the animation and the current angle between segments
+        self.bodies = [self.body] + \
+                [s[0] for s in self.body_segments] + \
+                [t[0] for sublist in self.tentacles for t in sublist] + \
+                [t[0] for sublist in self.ltentacles for t in sublist]
+        self.body_masses = [b.mass for b in self.bodies]
+        self.shapes = [shape for b in self.bodies for shape in b.shapes]
+        # the squid is created stretched out, so this is as far as the bodies get
+        self.extent = max((b.position - self.body.position).length for b in self.bodies) + EXTENT_SLACK
+
+        self.tentacle_bodies = [t[0] for tentacle in self.tentacles for t in tentacle]
+        self.tentacle_motors = [t[2] for tentacle in self.tentacles for t in tentacle]
+        self.motor_rates = np.zeros((N_TENTACLES, N_TENTACLE_SEGMENTS))
+        self.pose_angles = np.array(DEFAULT_POSE, dtype=float)
+        segments = np.arange(N_TENTACLE_SEGMENTS)
+        self.wiggle_div = np.tile(5.0 - segments, (N_TENTACLES, 1))
+        self.wiggle_phase = segments[None, :] + 1009 * np.arange(N_TENTACLES)[:, None]
+        self.parent_angles = np.zeros((N_TENTACLES, N_TENTACLE_SEGMENTS))
+        self.ltentacle_bodies = [t[0] for tentacle in self.ltentacles for t in tentacle]
+        self.build_limbs()
+
+    def build_limbs(self):
+        """ Work out the sections and texture coordinates of the limbs, they are the same every frame """
+        index = {b: k for k, b in enumerate(self.bodies)}
+        sections = []
+        self.limbs = []
+
+        def add_limb(texture, chain: list[tuple[pm.Body, float]], v_coords: list[float], flip: bool):
+            """
+            chain is a list of (body, half height) from one end of the limb to the other,
+            v_coords the texture rows at the ends and joints
+            """
+            start = len(sections)
+            first, half = chain[0]
+            sections.append((index[first], -half, index[first], -half, texture.width))
+            for (prev, prev_half), (body, half) in zip(chain, chain[1:]):
+                sections.append((index[prev], prev_half, index[body], -half, texture.width))
+            last, half = chain[-1]
+            sections.append((index[last], half, index[last], half, texture.width))
+            u_left, u_right = (texture.width, 0) if flip else (0, texture.width)
+            uvs = sprites.texture_uvs(texture, [(u_left, u_right, v) for v in v_coords])
+            self.limbs.append((texture, uvs, start, len(sections)))
+
+        # the body goes from the tip at the top of the texture down to the main body at the bottom
+        body_rows = self.body_texture.height / 4
+        body_chain = [(s[0], body_rows) for s in reversed(self.body_segments)] + [(self.body, body_rows)]
+        add_limb(self.body_texture, body_chain, [body_rows * k for k in range(N_BODY_SEGMENTS + 1)], False)
+
+        # the long tentacles are 60 pixels of tentacle and 8 of hand, the left one is flipped
+        ltentacle_rows = (self.ltentacle_texture.height - 8) / (N_LTENTACLE_SEGMENTS - 1)
+        for i, tentacle in enumerate(self.ltentacles):
+            chain = [(t[0], ltentacle_rows) for t in tentacle[:-1]] + [(tentacle[-1][0], 8)]
+            v_coords = [ltentacle_rows * k for k in range(N_LTENTACLE_SEGMENTS)] + [self.ltentacle_texture.height]
+            add_limb(self.ltentacle_texture, chain, v_coords, i >= 1)
+
+        # the tentacle texture is split into equal segments, the right tentacles are flipped
+        tentacle_rows = self.tentacle_texture.height / N_TENTACLE_SEGMENTS
         for i, tentacle in enumerate(self.tentacles):
-            last_body = self.body
-            for j, (t_body, t_rotary_spring, t_motor) in enumerate(tentacle):
-                cur_angle = (last_body.angle - t_body.angle)
-                rand_angle_diff = 5 * (2*math.pi/360) * math.sin(self.anim_time * 9 / (5.0 - j) + j + (1009 * i))
-                want_angle = self.cur_pose[i][j] + rand_angle_diff
-                ang_diff = (want_angle - cur_angle) * 2
-                # the biggest prime below 1000 is 
-
-                if abs(ang_diff) < 0.05:
-                    ang_diff = 0.0
-                elif abs(ang_diff) < 0.3:
-                    ang_diff = 0.3 * (ang_diff / abs(ang_diff))
-                elif abs(ang_diff) > 0.6:
-                    ang_diff = 0.6 * (ang_diff / abs(ang_diff))
-                last_body = t_body
+            chain = [(t[0], tentacle_rows) for t in tentacle]
+            add_limb(self.tentacle_texture, chain, [tentacle_rows * k for k in range(N_TENTACLE_SEGMENTS + 1)], i >= 2)
 
-                t_motor.rate = ang_diff * 3
-        
+        columns = np.array(sections, dtype=float)
+        self.section_a = columns[:, 0].astype(int)
+        self.section_ay = columns[:, 1]
+        self.section_b = columns[:, 2].astype(int)
+        self.section_by = columns[:, 3]
+        self.section_half_width = columns[:, 4]
+
+    def update(self, dt: float):
+        # set the tentacles' motor rates depending on the animation and the current angle between segments
+        body_angle = self.body.angle
+        angles = np.fromiter((b.angle for b in self.tentacle_bodies), float, len(self.tentacle_bodies)).reshape(N_TENTACLES, N_TENTACLE_SEGMENTS)
+        parent_angles = self.parent_angles
+        parent_angles[:, 0] = body_angle
+        parent_angles[:, 1:] = angles[:, :-1]
+        cur_angle = parent_angles - angles
+        rand_angle_diff = WIGGLE_ANGLE * np.sin(self.anim_time * 9 / self.wiggle_div + self.wiggle_phase)
+        ang_diff = (self.pose_angles + rand_angle_diff - cur_angle) * 2
+        # small differences are ignored, the rest is pushed at a rate between 0.3 and 0.6
+        magnitude = np.abs(ang_diff)
+        rates = np.where(magnitude < 0.05, 0.0, np.sign(ang_diff) * np.clip(magnitude, 0.3, 0.6)) * 3
+        # the rates are often at their limits, so only the ones that changed are passed to pymunk
+        changed = np.flatnonzero(rates != self.motor_rates)
+        for k, rate in zip(changed.tolist(), rates.ravel()[changed].tolist()):
+            self.tentacle_motors[k].rate = rate
+        self.motor_rates = rates
+
+        # if the relative angle between the body and a long tentacle segment is more than pi
+        # add 2pi or -2pi to the segment's angle to release the tension when the tentacle gets wound up
+        for t_body in self.ltentacle_bodies:
+            rel_angle = body_angle - t_body.angle
+            if rel_angle > math.pi:
+                t_body.angle += 2 * math.pi
+            elif rel_angle < -math.pi:
+                t_body.angle -= 2 * math.pi
         # add drag to the end of the long tentacles
-        for i, tentacle in enumerate(self.ltentacles):
-            last_body = self.body
-            for j, (t_body, t_rotary_spring, t_motor) in enumerate(tentacle):
-                # if the relative angle between the last segment and the current one is more than pi
-                # add 2pi or -2pi to the resting angle to release the tension when the tentacle gets wound up
-                rel_angle = (last_body.angle - t_body.angle)
-                if rel_angle > math.pi:
-                    t_body.angle += 2 * math.pi
-                elif rel_angle < -math.pi:
-                    t_body.angle -= 2 * math.pi
+        for tentacle in self.ltentacles:
             tentacle[-1][0].velocity *= 1-dt
 
-
-        bodies = [self.body] + \
-                [s[0] for s in self.body_segments] + \
-                [t[0] for sublist in self.tentacles for t in sublist] + \
-                [t[0] for sublist in self.ltentacles for t in sublist]
-        
-        # apply a force to the squid if it is above the water
-        for b in bodies:
-            if b.position.y < 0:
-                b.apply_force_at_world_point((0, 10000 * dt * b.mass), b.position)
+        # apply a force to the squid if it is above the water - when it's deep enough, no part of it can be
+        if self.body.position.y < self.extent:
+            for b, mass in zip(self.bodies, self.body_masses):
+                if b.position.y < 0:
+                    b.apply_force_at_world_point((0, 10000 * dt * mass), b.position)
 
         # apply angular drag to the squid
         self.body.angular_velocity *= 1 - dt * 0.5
@@ -245,114 +339,70 @@ class Squid():
 
         self.anim_time += dt
 
-    def draw(self, mpos: Vec2):
-        """Draw the squid"""
-        
-        # draw the base segment
-        pr.draw_texture_pro(self.body_texture, 
-            (0, self.body_texture.height * 3/4, self.body_texture.width, self.body_texture.height/4),
-            (self.body.position.x,
-                self.body.position.y, 
-                self.body_texture.width*2, 
-                self.body_texture.height*2/4),
-            (self.body_texture.width*2/2, self.body_texture.height*2/4/2),
-            self.body.angle * 180 / math.pi,
-            pr.WHITE
-        )
+    def draw(self, mpos: Vec2, transform: Transform):
+        """Draw the squid, transform gives the position and angle to draw a body at"""
+        # every limb is a strip through its segments, the sections at the joints are
+        # averaged from the two segments that meet there so the limbs bend without gaps
+        transforms = [transform(b) for b in self.bodies]
+        pos = np.array([tuple(p) for p, _ in transforms])
+        angle = np.array([a for _, a in transforms])
+        cos = np.cos(angle)
+        sin = np.sin(angle)
+        a, b = self.section_a, self.section_b
+        # a point (0, y) in the body's coordinates is (-y sin, y cos) away from its position
+        center_x = (pos[a, 0] - sin[a] * self.section_ay + pos[b, 0] - sin[b] * self.section_by) / 2
+        center_y = (pos[a, 1] + cos[a] * self.section_ay + pos[b, 1] + cos[b] * self.section_by) / 2
+        axis_x = cos[a] + cos[b]
+        axis_y = sin[a] + sin[b]
+        scale = self.section_half_width / np.maximum(np.hypot(axis_x, axis_y), 1e-9)
+        axis_x *= scale
+        axis_y *= scale
+        vertices = np.stack((center_x - axis_x, center_y - axis_y, center_x + axis_x, center_y + axis_y), axis=1).tolist()
+
+        # draw the body
+        texture, uvs, start, end = self.limbs[0]
+        sprites.draw_strip(texture, uvs, vertices[start:end], pr.WHITE, layer=LAYER_SQUID)
 
         # draw the eyes
+        body_pos, body_angle = transforms[0]
         for eye_center in [(-9, -3), (9, -3)]:
-            eye_center = self.body.local_to_world(eye_center)
+            eye_center = body_pos + Vec2(*eye_center).rotated(body_angle)
             dir_to_mouse = (mpos - eye_center).normalized()
             eye_center += dir_to_mouse * 2
-            pr.draw_rectangle_pro(
+            sprites.draw_rectangle_pro(
                 (eye_center.x, eye_center.y, 4, 4),
                 (2, 2),
-                self.body.angle * 180 / math.pi,
-                pr.BLACK
+                body_angle * 180 / math.pi,
+                pr.BLACK,
+                layer=LAYER_SQUID_EYES
             )
 
-        # draw the other body segments
-        for i, seg in enumerate(self.body_segments):
-            seg_body = seg[0]
-
-            pr.draw_texture_pro(self.body_texture,
-                (0, self.body_texture.height * (2-i)/4, self.body_texture.width, self.body_texture.height/4),
-                (seg_body.position.x,
-                    seg_body.position.y, 
-                    self.body_texture.width*2, 
-                    self.body_texture.height*2/4),
-                (self.body_texture.width*2/2, self.body_texture.height*2/4/2),
-                seg_body.angle * 180 / math.pi,
-                pr.WHITE
-            )
-
-        # draw the long tentacles
-        for i, tentacle in enumerate(self.ltentacles):
-            for j, (t_body, t_rotary_spring, t_motor) in enumerate(tentacle):
-                if j < N_LTENTACLE_SEGMENTS - 1:
-                    pr.draw_texture_pro(self.ltentacle_texture,
-                        (0 if i < 1 else self.ltentacle_texture.width, 
-                            (self.ltentacle_texture.height-8) * j / (len(tentacle)-1), 
-                            self.ltentacle_texture.width if i < 1 else -self.ltentacle_texture.width, 
-                            (self.ltentacle_texture.height-8) / (len(tentacle))-1),
-                        (t_body.position.x,
-                            t_body.position.y, 
-                            self.ltentacle_texture.width*2, 
-                            (self.ltentacle_texture.height-8)*2 / (len(tentacle)-1)),
-                        (self.ltentacle_texture.width*2/2, (self.ltentacle_texture.height-8)*2/(len(tentacle)-1)/2),
-                        t_body.angle * 180 / math.pi,
-                        pr.WHITE
-                    )
-                else: # draw the "hand"
-                    pr.draw_texture_pro(self.ltentacle_texture,
-                        (0 if i < 1 else self.ltentacle_texture.width, 
-                            self.ltentacle_texture.height-8, 
-                            self.ltentacle_texture.width if i < 1 else -self.ltentacle_texture.width, 
-                            8),
-                        (t_body.position.x,
-                            t_body.position.y, 
-                            self.ltentacle_texture.width*2, 
-                            16),
-                        (self.ltentacle_texture.width*2/2, 16/2),
-                        t_body.angle * 180 / math.pi,
-                        pr.WHITE
-                    )
-                
+        # draw the long tentacles and then the tentacles
+        for texture, uvs, start, end in self.limbs[1:]:
+            sprites.draw_strip(texture, uvs, vertices[start:end], pr.WHITE, layer=LAYER_SQUID)
 
-        # draw the tentacles
-        for i, tentacle in enumerate(self.tentacles):
-            for j, (t_body, t_rotary_spring, t_motor) in enumerate(tentacle):
-                # the tentacle texture is separated into segments of 5 pixels
-                # the texture should be horizontally flipped if the tentacle is on the right side of the squid
-                pr.draw_texture_pro(self.tentacle_texture,
-                    (0 if i < 2 else self.tentacle_texture.width, 
-                        self.tentacle_texture.height * j / len(tentacle), 
-                        self.tentacle_texture.width if i < 2 else -self.tentacle_texture.width, 
-                        self.tentacle_texture.height / len(tentacle)),
-                    (t_body.position.x,
-                        t_body.position.y, 
-                        self.tentacle_texture.width*2, 
-                        self.tentacle_texture.height*2 / len(tentacle)),
-                    (self.tentacle_texture.width*2/2, self.tentacle_texture.height*2/len(tentacle)/2),
-                    t_body.angle * 180 / math.pi,
-                    pr.WHITE
-                )
+    def get_shapes(self) -> list[pm.Shape]:
+        """ All the shapes of the squid's body, segments and tentacles """
+        return self.shapes
 
     def set_pose(self, pose: Pose = None):
         """
         Sets on the squid's tentacles.
+        The springs are only changed when the pose isn't the current one already.
         """
         pose = DEFAULT_POSE if pose is None else pose
+        if pose is self.cur_pose:
+            return
 
         for i, tentacle in enumerate(self.tentacles):
             if i >= len(pose) or pose[i] is None:
                 continue
             t_pose = pose[i]
             for j, (t_body, t_constraint, t_motor) in enumerate(tentacle):
-                if len(t_pose) <= j or t_pose[j] is None:
+                if len(t_pose) <= j or t_pose[j] is None or self.pose_angles[i, j] == t_pose[j]:
                     continue
                 t_constraint.rest_angle = t_pose[j]
+                self.pose_angles[i, j] = t_pose[j]
         
         self.cur_pose = pose
 
@@ -0,0 +1,258 @@
+"""
+An environment for training and evaluating squid controllers, without a window.
+It follows the gymnasium API (reset() -> (observation, info),
+step(action) -> (observation, reward, terminated, truncated, info)) without depending on it.
+
+    env = SquidEnv()
+    obs, info = env.reset(seed=1)
+    obs, reward, terminated, truncated, info = env.step(np.array([1.0, 0.2, 1.0, 0.0]))
+
+VectorSquidEnv steps several worlds at once, each in its own process. The observations,
+actions and rewards are passed through shared memory, only commands and info dicts are pickled.
+
+    with VectorSquidEnv(8) as envs:
+        obs, infos = envs.reset(seed=1)
+        obs, rewards, terminated, truncated, infos = envs.step(actions)
+
+The action is the mouse position relative to the squid, scaled to [-1, 1] by ACTION_RANGE,
+and the left and right mouse buttons, pressed when above 0.5.
+The reward is the points the squid scored during the step.
+The observation is a float32 vector of
+    the squid's position, velocity, facing, spin, push buildup, good push and whether it is in the water
+    the position and velocity of every other squid body relative to the squid's body
+    the NEAREST_FISH closest fish and NEAREST_HUMANS closest humans within SENSE_RADIUS -
+        relative position, velocity and 1 for a present one, zeros for empty slots
+"""
+import math
+import random
+import multiprocessing
+from multiprocessing import shared_memory
+
+import numpy as np
+from pymunk.vec2d import Vec2d as Vec2
+
+from world import World, Inputs, load_headless_game_data
+from walls import load_level_walls
+from fish import Fish
+from ship import Ship
+from squid import N_BODY_SEGMENTS, N_TENTACLES, N_TENTACLE_SEGMENTS, N_LTENTACLES, N_LTENTACLE_SEGMENTS
+
+# how far from the squid the mouse can be put, in world units
+ACTION_RANGE = 300
+ACTION_SIZE = 4
+NEAREST_FISH = 4
+NEAREST_HUMANS = 4
+SENSE_RADIUS = 600
+# observations are scaled by these so they stay around [-1, 1]
+POSITION_SCALE = 1000
+SPEED_SCALE = 350
+LIMB_SCALE = 150
+SQUID_BODIES = N_BODY_SEGMENTS + N_TENTACLES * N_TENTACLE_SEGMENTS + N_LTENTACLES * N_LTENTACLE_SEGMENTS
+OBSERVATION_SIZE = 10 + (SQUID_BODIES - 1) * 4 + (NEAREST_FISH + NEAREST_HUMANS) * 5
+# ticks of the simulation per step, and steps per episode
+TICKS_PER_STEP = 4
+MAX_STEPS = 60 * 60 // TICKS_PER_STEP
+
+def nearest(objects: list, position: Vec2, count: int) -> list[tuple[Vec2, Vec2]]:
+    """ (relative position, velocity) of the count closest objects within SENSE_RADIUS """
+    found = []
+    for obj in objects:
+        offset = obj.body.position - position
+        distance = offset.length
+        if distance < SENSE_RADIUS:
+            found.append((distance, offset, obj.body.velocity))
+    found.sort(key=lambda f: f[0])
+    return [(offset, velocity) for _, offset, velocity in found[:count]]
+
+class SquidEnv():
+    """ A single world behind reset() and step() """
+    game_data: dict
+    walls: list[list[float]]
+    ticks_per_step: int
+    max_steps: int
+    world: World
+    steps: int
+    observation: np.ndarray
+
+    def __init__(self, res_dir: str = "res", ticks_per_step: int = TICKS_PER_STEP, max_steps: int = MAX_STEPS):
+        self.game_data = load_headless_game_data(res_dir)
+        self.walls = load_level_walls(res_dir)
+        self.ticks_per_step = ticks_per_step
+        self.max_steps = max_steps
+        self.world = None
+        self.steps = 0
+        self.observation = np.zeros(OBSERVATION_SIZE, dtype=np.float32)
+
+    def reset(self, seed: int = None) -> tuple[np.ndarray, dict]:
+        random.seed(seed)
+        # the world keeps its own list of walls
+        self.world = World(self.game_data, [list(w) for w in self.walls])
+        self.steps = 0
+        return self.observe(), self.info()
+
+    def step(self, action: np.ndarray) -> tuple[np.ndarray, float, bool, bool, dict]:
+        world = self.world
+        squid = world.squid
+        dx, dy, left, right = np.clip(action, -1, 1).tolist()
+        offset = Vec2(dx, dy) * ACTION_RANGE
+        points = world.point_total
+        for _ in range(self.ticks_per_step):
+            # the mouse stays where it is relative to the squid, like it does with the camera following
+            world.step(world.fixed_dt, Inputs(squid.body.position + offset, left > 0.5, right > 0.5))
+        self.steps += 1
+        observation = self.observe()
+        # the simulation can't recover once the squid's bodies stop being finite
+        terminated = not np.isfinite(observation).all()
+        truncated = self.steps >= self.max_steps
+        return observation, float(world.point_total - points), terminated, truncated, self.info()
+
+    def info(self) -> dict:
+        return {"points": self.world.point_total, "ticks": self.world.tick_count}
+
+    def observe(self) -> np.ndarray:
+        world = self.world
+        squid = world.squid
+        body = squid.body
+        position = body.position
+        velocity = body.velocity
+        obs = self.observation
+        obs[:10] = (position.x / POSITION_SCALE, position.y / POSITION_SCALE,
+                    velocity.x / SPEED_SCALE, velocity.y / SPEED_SCALE,
+                    math.sin(body.angle), math.cos(body.angle), body.angular_velocity,
+                    world.push_buildup, float(world.good_push), float(position.y > 0))
+
+        limbs = np.array([(*b.position, *b.velocity) for b in squid.bodies[1:]])
+        limbs[:, 0:2] -= position
+        limbs[:, 0:2] /= LIMB_SCALE
+        limbs[:, 2:4] -= velocity
+        limbs[:, 2:4] /= SPEED_SCALE
+        end = 10 + limbs.size
+        obs[10:end] = limbs.ravel()
+
+        fish = [obj for obj in world.game_objects if isinstance(obj, Fish)]
+        humans = [h for obj in world.game_objects if isinstance(obj, Ship) for h in obj.humans]
+        for objects, count in ((fish, NEAREST_FISH), (humans, NEAREST_HUMANS)):
+            slots = obs[end:end + count * 5].reshape(count, 5)
+            slots[:] = 0
+            for slot, (offset, vel) in zip(slots, nearest(objects, position, count)):
+                slot[:] = (offset.x / SENSE_RADIUS, offset.y / SENSE_RADIUS, vel.x / SPEED_SCALE, vel.y / SPEED_SCALE, 1)
+            end += count * 5
+        return obs.copy()
+
+def shared_array(shape: tuple, dtype) -> tuple[shared_memory.SharedMemory, np.ndarray]:
+    memory = shared_memory.SharedMemory(create=True, size=max(int(np.prod(shape)) * np.dtype(dtype).itemsize, 1))
+    return memory, np.ndarray(shape, dtype=dtype, buffer=memory.buf)
+
+def run_worker(index: int, names: dict[str, str], num_envs: int, connection, env_args: dict):
+    """ Owns one SquidEnv and writes its row of the shared buffers """
+    memories = {name: shared_memory.SharedMemory(name=shm) for name, shm in names.items()}
+    obs = np.ndarray((num_envs, OBSERVATION_SIZE), dtype=np.float32, buffer=memories["obs"].buf)[index]
+    actions = np.ndarray((num_envs, ACTION_SIZE), dtype=np.float32, buffer=memories["actions"].buf)[index]
+    rewards = np.ndarray(num_envs, dtype=np.float32, buffer=memories["rewards"].buf)
+    terminated = np.ndarray(num_envs, dtype=np.bool_, buffer=memories["terminated"].buf)
+    truncated = np.ndarray(num_envs, dtype=np.bool_, buffer=memories["truncated"].buf)
+    env = SquidEnv(**env_args)
+    try:
+        while True:
+            command, arg = connection.recv()
+            if command == "reset":
+                obs[:], info = env.reset(arg)
+                connection.send(info)
+            elif command == "step":
+                observation, rewards[index], terminated[index], truncated[index], info = env.step(actions)
+                if terminated[index] or truncated[index]:
+                    # start the next episode right away, the last observation goes with the info
+                    info["final_observation"] = observation
+                    observation, info["reset_info"] = env.reset()
+                obs[:] = observation
+                connection.send(info)
+            elif command == "close":
+                break
+    finally:
+        # the arrays have to go before the memory they point to can be closed
+        del obs, actions, rewards, terminated, truncated
+        for memory in memories.values():
+            memory.close()
+
+class VectorSquidEnv():
+    """
+    num_envs SquidEnvs in worker processes, stepped together.
+    An environment that finishes an episode is reset by its worker, the observation it returns is
+    the first one of the new episode and the last one of the old episode is in its info["final_observation"].
+    """
+    num_envs: int
+    memories: list[shared_memory.SharedMemory]
+    observations: np.ndarray
+    actions: np.ndarray
+    rewards: np.ndarray
+    terminated: np.ndarray
+    truncated: np.ndarray
+    connections: list
+    processes: list[multiprocessing.Process]
+
+    def __init__(self, num_envs: int, **env_args):
+        self.num_envs = num_envs
+        buffers = {
+            "obs": ((num_envs, OBSERVATION_SIZE), np.float32),
+            "actions": ((num_envs, ACTION_SIZE), np.float32),
+            "rewards": ((num_envs,), np.float32),
+            "terminated": ((num_envs,), np.bool_),
+            "truncated": ((num_envs,), np.bool_),
+        }
+        self.memories = []
+        names = {}
+        arrays = {}
+        for name, (shape, dtype) in buffers.items():
+            memory, arrays[name] = shared_array(shape, dtype)
+            self.memories.append(memory)
+            names[name] = memory.name
+        self.observations = arrays["obs"]
+        self.actions = arrays["actions"]
+        self.rewards = arrays["rewards"]
+        self.terminated = arrays["terminated"]
+        self.truncated = arrays["truncated"]
+
+        self.connections = []
+        self.processes = []
+        for i in range(num_envs):
+            parent, child = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=run_worker, args=(i, names, num_envs, child, env_args), daemon=True)
+            process.start()
+            child.close()
+            self.connections.append(parent)
+            self.processes.append(process)
+
+    def reset(self, seed: int = None) -> tuple[np.ndarray, list[dict]]:
+        """ Reset every environment, the i-th one with seed + i """
+        for i, connection in enumerate(self.connections):
+            connection.send(("reset", None if seed is None else seed + i))
+        infos = [connection.recv() for connection in self.connections]
+        return self.observations.copy(), infos
+
+    def step(self, actions: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, list[dict]]:
+        self.actions[:] = actions
+        for connection in self.connections:
+            connection.send(("step", None))
+        infos = [connection.recv() for connection in self.connections]
+        return self.observations.copy(), self.rewards.copy(), self.terminated.copy(), self.truncated.copy(), infos
+
+    def close(self):
+        if not self.processes:
+            return
+        for connection in self.connections:
+            connection.send(("close", None))
+        for process in self.processes:
+            process.join()
+        self.connections.clear()
+        self.processes.clear()
+        del self.observations, self.actions, self.rewards, self.terminated, self.truncated
+        for memory in self.memories:
+            memory.close()
+            memory.unlink()
+        self.memories.clear()
+
+    def __enter__(self) -> "VectorSquidEnv":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
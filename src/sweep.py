@@ -0,0 +1,204 @@
+"""
+Runs a scripted headless session for many sets of movement parameters on a process pool.
+Run from the repository root:
+
+    python src/sweep.py --samples 2000 --out sweep.csv
+    python src/sweep.py --grid turn_speed=1,1.5,2 --grid push_force=1500,2000,3000 --out sweep.csv
+
+Without --grid, --samples parameter sets are drawn uniformly from the ranges in PARAMETERS
+(--param limits which ones are varied, the rest keep their defaults). With --grid every combination
+of the listed values is run. Every set gets a fresh world, created with the same seed, so the
+only difference between the sessions is the parameters.
+
+The session lets the squid settle, turns it towards a point with both buttons held, pumps it
+towards the point with the left button, then lets it drift:
+    turn_time       seconds until it faced the point, TURN_LIMIT if it never did
+    top_speed       fastest the squid got while pumping
+    limb_speed      fastest any squid body moved relative to the squid's body while drifting - high values mean jitter,
+                    the turn and the pumping swing the limbs on purpose so they aren't measured
+    drift_spin      mean absolute spin while drifting with the buttons released
+    stable          0 if a body ended up somewhere impossible or the simulation stopped being finite
+"""
+import os
+import csv
+import math
+import time
+import random
+import argparse
+import itertools
+import multiprocessing
+
+from pymunk.vec2d import Vec2d as Vec2
+
+from world import World, Inputs, MovementParams, PHYSICS_DT, load_headless_game_data
+from walls import load_level_walls
+
+SWEEP_SEED = 1234
+# (low, high) of the values --samples draws from
+PARAMETERS = {
+    "turn_speed": (0.75, 3.0),
+    "max_speed": (200, 500),
+    "push_force": (1000, 4000),
+    "water_drag": (0.05, 0.5),
+    "side_drag": (1, 10),
+    "spin_drag": (2, 10),
+    "tentacle_stiffness": (2000, 10000),
+    "tentacle_damping": (500, 3000),
+}
+METRICS = ["turn_time", "top_speed", "limb_speed", "drift_spin", "stable"]
+# length of the session's phases in seconds
+SETTLE_TIME = 1.0
+TURN_LIMIT = 3.0
+PUMP_TIME = 4.0
+DRIFT_TIME = 2.0
+# the left button is held this long and released this long while pumping
+PUMP_PERIOD = 1.0
+# how close the squid has to face the point for the turn to count, in radians
+TURN_TOLERANCE = 0.35
+# where the mouse is, relative to the squid
+TARGET_DISTANCE = 200
+# the squid starts out facing up, this is along the water and a bit down
+DIRECTION = Vec2(1, 0.3).normalized()
+
+# loaded once per worker process
+worker_game_data: dict = None
+worker_walls: list[list[float]] = None
+
+def init_worker(res_dir: str):
+    global worker_game_data, worker_walls
+    worker_game_data = load_headless_game_data(res_dir)
+    worker_walls = load_level_walls(res_dir)
+
+def facing(world: World) -> Vec2:
+    """ The direction the squid swims in """
+    return -Vec2(0, 1).rotated(world.squid.body.angle)
+
+def run_session(params: dict) -> dict:
+    random.seed(SWEEP_SEED)
+    # the world keeps its own list of walls
+    world = World(worker_game_data, [list(w) for w in worker_walls], movement=MovementParams(**params))
+    squid = world.squid
+    dt = PHYSICS_DT
+    top_speed = 0.0
+    turn_time = TURN_LIMIT
+    limb_speed = 0.0
+    drift_spin = 0.0
+    stable = True
+
+    def tick(left_down: bool, right_down: bool = False, measure: bool = False) -> bool:
+        """ Run a tick and update the stability metrics. Returns False once the squid broke """
+        nonlocal limb_speed, stable
+        world.step(dt, Inputs(squid.body.position + DIRECTION * TARGET_DISTANCE, left_down, right_down))
+        velocity = squid.body.velocity
+        for body in squid.bodies:
+            if not math.isfinite(body.position.x) or not math.isfinite(body.position.y) or \
+                    body.position.get_distance(squid.body.position) > squid.extent:
+                stable = False
+                return False
+            if measure:
+                limb_speed = max(limb_speed, (body.velocity - velocity).length)
+        return True
+
+    # the squid is created straight, its tentacles swing into the pose first
+    ok = True
+    for i in range(int(SETTLE_TIME / dt)):
+        ok = ok and tick(False)
+
+    for i in range(int(TURN_LIMIT / dt)):
+        ok = ok and tick(True, True)
+        if ok and abs(facing(world).get_angle_between(DIRECTION)) < TURN_TOLERANCE:
+            turn_time = (i + 1) * dt
+            break
+
+    for i in range(int(PUMP_TIME / dt)):
+        ok = ok and tick((i * dt) % (2 * PUMP_PERIOD) < PUMP_PERIOD)
+        top_speed = max(top_speed, squid.body.velocity.length)
+
+    ticks = int(DRIFT_TIME / dt)
+    for i in range(ticks):
+        ok = ok and tick(False, measure=True)
+        drift_spin += abs(squid.body.angular_velocity) / ticks
+
+    return {"turn_time": turn_time, "top_speed": top_speed, "limb_speed": limb_speed,
+            "drift_spin": drift_spin, "stable": int(stable)}
+
+def run_indexed(job: tuple[int, dict]) -> tuple[int, dict, dict]:
+    index, params = job
+    return index, params, run_session(params)
+
+def grid_configs(grid: list[str]) -> list[dict]:
+    """ Every combination of name=v1,v2,... values """
+    names = []
+    values = []
+    for entry in grid:
+        name, _, listed = entry.partition("=")
+        if name not in PARAMETERS:
+            raise ValueError("unknown parameter %s" % name)
+        names.append(name)
+        values.append([float(v) for v in listed.split(",")])
+    return [dict(zip(names, combination)) for combination in itertools.product(*values)]
+
+def sample_configs(count: int, names: list[str], seed: int) -> list[dict]:
+    rng = random.Random(seed)
+    return [{name: rng.uniform(*PARAMETERS[name]) for name in names} for _ in range(count)]
+
+def sweep(configs: list[dict], res_dir: str = "res", processes: int = None) -> list[tuple[dict, dict]]:
+    """ The (parameters, metrics) of every config, in the order of the configs """
+    results = [None] * len(configs)
+    processes = processes or os.cpu_count()
+    # small chunks keep every process busy until the end, but not so small that sending them dominates
+    chunksize = max(1, len(configs) // (processes * 16))
+    start = time.perf_counter()
+    with multiprocessing.Pool(processes, initializer=init_worker, initargs=(res_dir,)) as pool:
+        for done, (index, params, metrics) in enumerate(pool.imap_unordered(run_indexed, enumerate(configs), chunksize), 1):
+            results[index] = (params, metrics)
+            if done % 100 == 0 or done == len(configs):
+                print("%d/%d configs in %.1f s" % (done, len(configs), time.perf_counter() - start))
+    return results
+
+def save_csv(file: str, results: list[tuple[dict, dict]]):
+    names = list(PARAMETERS)
+    defaults = vars(MovementParams())
+    with open(file, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(names + METRICS)
+        for params, metrics in results:
+            writer.writerow([params.get(name, defaults[name]) for name in names] + [metrics[m] for m in METRICS])
+
+def print_table(results: list[tuple[dict, dict]], sort: str, count: int):
+    """ The best rows by the sort metric, a leading - sorts from the highest. Unstable configs go last """
+    descending = sort.startswith("-")
+    metric = sort.lstrip("-")
+    rows = sorted(results, key=lambda r: (-r[1]["stable"], -r[1][metric] if descending else r[1][metric]))
+    names = sorted({name for params, _ in results for name in params}, key=list(PARAMETERS).index)
+    print(" ".join("%12s" % n[:12] for n in names + METRICS))
+    for params, metrics in rows[:count]:
+        print(" ".join("%12.3f" % params[n] for n in names) + " " + " ".join("%12.3f" % metrics[m] for m in METRICS))
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep the squid's movement parameters")
+    parser.add_argument("--samples", type=int, default=100, help="random parameter sets to run")
+    parser.add_argument("--param", action="append", choices=list(PARAMETERS), help="only vary these parameters")
+    parser.add_argument("--grid", action="append", help="name=v1,v2,... run every combination instead of samples")
+    parser.add_argument("--seed", type=int, default=0, help="seed for drawing the samples")
+    parser.add_argument("--processes", type=int, help="worker processes, one per core by default")
+    parser.add_argument("--out", help="write every result to this csv file")
+    parser.add_argument("--sort", default="-top_speed", help="metric to rank the printed table by, - for highest first")
+    parser.add_argument("--top", type=int, default=10, help="rows of the table to print")
+    parser.add_argument("--res", default="res", help="resource directory")
+    args = parser.parse_args()
+
+    if args.sort.lstrip("-") not in METRICS:
+        parser.error("--sort has to be one of %s" % ", ".join(METRICS))
+    if args.grid:
+        configs = grid_configs(args.grid)
+    else:
+        configs = sample_configs(args.samples, args.param or list(PARAMETERS), args.seed)
+
+    results = sweep(configs, args.res, args.processes)
+    if args.out:
+        save_csv(args.out, results)
+    print_table(results, args.sort, args.top)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+import pyray as pr
+
+# raylib's default font is 10 pixels high, and draw_text spaces the letters by size / 10
+DEFAULT_FONT_SIZE = 10
+MAX_ENTRIES = 128
+
+class TextCache():
+    """
+    Text rasterised into render textures once and drawn as a single texture afterwards.
+    Strings that change every frame (like the speed) can be drawn from cached glyphs instead,
+    so the font is only laid out when a new string or glyph shows up.
+
+    Render textures can only be created outside of begin_mode_2d (end_texture_mode resets the
+    camera transform), so everything that will be drawn has to go through prepare() or
+    prepare_glyphs() first. Drawing something that wasn't prepared falls back to pr.draw_text.
+    Prepared strings are evicted least recently used first, glyphs stay until unload().
+    """
+    # (text, size, color, outline) -> (render texture, width, height)
+    entries: dict[tuple, tuple[pr.RenderTexture2D, int, int]]
+    glyphs: dict[tuple, tuple[pr.RenderTexture2D, int, int]]
+    max_entries: int
+    rasterised: int
+
+    def __init__(self, max_entries: int = MAX_ENTRIES):
+        self.entries = {}
+        self.glyphs = {}
+        self.max_entries = max_entries
+        self.rasterised = 0
+
+    def key(self, text: str, size: int, color: pr.Color, outline: pr.Color = None) -> tuple:
+        return (text, size, tuple(color), tuple(outline) if outline is not None else None)
+
+    def prepare(self, text: str, size: int, color: pr.Color, outline: pr.Color = None):
+        """
+        Rasterise the text unless it already is. With an outline color the text is drawn
+        one size bigger in that color first, like the floating point numbers.
+        """
+        key = self.key(text, size, color, outline)
+        if self.lookup(key) is not None:
+            return
+        if len(self.entries) >= self.max_entries:
+            oldest = next(iter(self.entries))
+            pr.unload_render_texture(self.entries.pop(oldest)[0])
+        self.entries[key] = self.rasterise(text, size, color, outline)
+
+    def rasterise(self, text: str, size: int, color: pr.Color, outline: pr.Color = None) -> tuple[pr.RenderTexture2D, int, int]:
+        big = size + 1 if outline is not None else size
+        width = max(pr.measure_text(text, big), 1)
+        height = big
+        target = pr.load_render_texture(width, height)
+        pr.begin_texture_mode(target)
+        pr.clear_background(pr.BLANK)
+        if outline is not None:
+            pr.draw_text(text, 0, 0, big, outline)
+        pr.draw_text(text, 0, 0, size, color)
+        pr.end_texture_mode()
+        self.rasterised += 1
+        return target, width, height
+
+    def lookup(self, key: tuple) -> tuple[pr.RenderTexture2D, int, int]:
+        """ The entry of the key, None if there is none. A hit moves it to the end, so the least recently used entries are evicted first """
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.entries[key] = entry
+        return entry
+
+    def prepare_glyphs(self, chars: str, size: int, color: pr.Color):
+        for ch in set(chars):
+            key = self.key(ch, size, color)
+            if key not in self.glyphs:
+                self.glyphs[key] = self.rasterise(ch, size, color)
+
+    def draw(self, text: str, x: int, y: int, size: int, color: pr.Color, outline: pr.Color = None):
+        entry = self.lookup(self.key(text, size, color, outline))
+        if entry is None:
+            if outline is not None:
+                pr.draw_text(text, x, y, size + 1, outline)
+            pr.draw_text(text, x, y, size, color)
+            return
+        target, width, height = entry
+        # render textures are stored upside down
+        pr.draw_texture_rec(target.texture, (0, 0, width, -height), (x, y), pr.WHITE)
+
+    def draw_glyphs(self, text: str, x: int, y: int, size: int, color: pr.Color):
+        """ Draw the text glyph by glyph from the cache, laid out like pr.draw_text would """
+        spacing = size // DEFAULT_FONT_SIZE
+        for ch in text:
+            entry = self.glyphs.get(self.key(ch, size, color))
+            if entry is None:
+                pr.draw_text(ch, x, y, size, color)
+                x += pr.measure_text(ch, size) + spacing
+                continue
+            target, width, height = entry
+            pr.draw_texture_rec(target.texture, (0, 0, width, -height), (x, y), pr.WHITE)
+            x += width + spacing
+
+    def unload(self):
+        for target, _, _ in list(self.entries.values()) + list(self.glyphs.values()):
+            pr.unload_render_texture(target)
+        self.entries.clear()
+        self.glyphs.clear()
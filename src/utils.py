@@ -1,4 +1,5 @@
 import math
+from collections.abc import Callable
 
 import pymunk as pm
 from pymunk.vec2d import Vec2d as Vec2
@@ -15,26 +16,54 @@ SQUID_CATEGORY = 0b100
 FISH_GROUP = 40
 FISH_CATEGORY = 0b100000
 
+# where to draw a body, its (position, angle)
+Transform = Callable[[pm.Body], tuple[Vec2, float]]
+
+def body_bb(body: pm.Body) -> pm.BB:
+    """ The bounding box of all the shapes of a body """
+    bb = None
+    for shape in body.shapes:
+        bb = shape.bb if bb is None else bb.merge(shape.bb)
+    return bb if bb is not None else pm.BB(body.position.x, body.position.y, body.position.x, body.position.y)
+
 def calc_boyancy(ship: pm.Body) -> tuple[float, Vec2]:
+    """
+    Returns the area of the body that is under water (y > 0) and the center of that area.
+    Every polygon of the body is clipped against the waterline edge by edge - the edges that
+    the clipping adds along the waterline have y=0, so they don't change the sums.
+    For many bodies at once use buoyancy.BuoyancySystem, which does the same in one numpy pass.
+    """
     # total area under water
     total = 0
     # we also need the center of gravity of the underwater part
-    center = Vec2(0, 0)
+    moment_x = 0
+    moment_y = 0
     for shape in ship.shapes:
-        new_verts = []
-        for vert in shape.get_vertices():
-            vert = ship.local_to_world(vert)
-            if vert.y > 0:
-                new_verts.append(vert)
-            else:
-                new_verts.append(Vec2(vert.x, 0))
-        new_poly = pm.Poly(None, new_verts)
-        area = new_poly.area
-        if area > 0:
-            total += area
-            center += new_poly.center_of_gravity * area
+        verts = [ship.local_to_world(v) for v in shape.get_vertices()]
+        area = 0
+        mx = 0
+        my = 0
+        for i in range(len(verts)):
+            a = verts[i]
+            b = verts[i - len(verts) + 1]
+            if a.y < 0 and b.y < 0:
+                continue
+            if a.y < 0:
+                a = a + (b - a) * (a.y / (a.y - b.y))
+            elif b.y < 0:
+                b = a + (b - a) * (a.y / (a.y - b.y))
+            cross = a.x * b.y - b.x * a.y
+            area += cross
+            mx += (a.x + b.x) * cross
+            my += (a.y + b.y) * cross
+        # the sums are signed by the winding of the polygon
+        if area < 0:
+            area, mx, my = -area, -mx, -my
+        total += area / 2
+        moment_x += mx / 6
+        moment_y += my / 6
 
     if total < 1:
         return 0, Vec2(0, 0)
 
-    return total * 1.025, ((center / total) if total > 0 else Vec2(0, 0))
+    return total * 1.025, Vec2(moment_x / total, moment_y / total)
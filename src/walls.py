@@ -0,0 +1,181 @@
+"""
+Compiles the level walls into a compact binary file.
+Run from the repository root after editing the walls (saving in the wall editor does it too):
+
+    python src/walls.py
+
+This reads res/walls.json, welds end points that are meant to be the same (the wall editor
+places them by mouse, so they are a fraction of a unit apart), merges segments that continue
+each other in a straight line, drops the ones with no length, and writes res/walls.bin. The game loads walls.bin when it
+was compiled from the walls.json that is there now, and merges the json itself otherwise, so both give the same walls.
+
+walls.bin is a 32 byte header (magic, version, segment count as little endian uint32, sha1 of walls.json)
+followed by x1, y1, x2, y2 for every segment as little endian float32.
+"""
+import os
+import json
+import hashlib
+import struct
+
+import numpy as np
+
+WALLS_JSON = "walls.json"
+WALLS_BIN = "walls.bin"
+MAGIC = b"WALL"
+VERSION = 2
+HEADER = struct.Struct("<4sII20s")
+SEGMENT_DTYPE = np.dtype("<f4")
+# shorter segments are dropped
+MIN_LENGTH = 0.01
+# end points closer than this are welded into one, a bit more than the mouse step at the game's zoom
+WELD_DISTANCE = 1.0
+# two segments are merged if the shared point is at most this far from the merged segment
+MERGE_TOLERANCE = 0.25
+
+def load_walls(file: str) -> list[list[float]]:
+    """
+    Load the walls from a json file
+    The file should have to following structure:
+    {
+        "walls": [
+            [x1, y1, x2, y2],
+            [x1, y1, x2, y2],
+            ...
+        ]
+    }
+    """
+    with open(file, "r") as f:
+        data = json.load(f)
+        walls = data["walls"]
+        return walls
+
+def save_walls_json(file: str, walls: list[list[float]]):
+    with open(file, "w") as f:
+        json.dump({"walls": walls}, f, indent=4)
+
+def point_line_distance(p, a, b) -> float:
+    """ Distance of p from the line through a and b """
+    dx = b[0] - a[0]
+    dy = b[1] - a[1]
+    length = (dx*dx + dy*dy) ** 0.5
+    return abs(dx * (p[1] - a[1]) - dy * (p[0] - a[0])) / length
+
+def weld_points(walls: list[list[float]], distance: float = WELD_DISTANCE) -> list[list[float]]:
+    """ Move end points onto the first end point that is closer than the distance """
+    points = []
+    # a grid of distance sized cells, so every point only looks at its neighbours
+    grid: dict[tuple[int, int], list[tuple[float, float]]] = {}
+
+    def weld(x: float, y: float) -> tuple[float, float]:
+        cx = int(x // distance)
+        cy = int(y // distance)
+        for gx in (cx - 1, cx, cx + 1):
+            for gy in (cy - 1, cy, cy + 1):
+                for px, py in grid.get((gx, gy), ()):
+                    if (px - x) ** 2 + (py - y) ** 2 <= distance * distance:
+                        return px, py
+        grid.setdefault((cx, cy), []).append((x, y))
+        return x, y
+
+    for x1, y1, x2, y2 in walls:
+        points.append([*weld(x1, y1), *weld(x2, y2)])
+    return points
+
+def merge_walls(walls: list[list[float]], tolerance: float = MERGE_TOLERANCE) -> list[list[float]]:
+    """
+    Merge segments that share an end point and continue in the same direction.
+    End points are welded first. Only points where exactly two segments meet are merged away, so corners that other
+    walls attach to stay where they are. Degenerate and duplicate segments are dropped.
+    """
+    segments = []
+    seen = set()
+    for x1, y1, x2, y2 in weld_points(walls):
+        a, b = (x1, y1), (x2, y2)
+        if (x2 - x1) ** 2 + (y2 - y1) ** 2 < MIN_LENGTH * MIN_LENGTH:
+            continue
+        key = (a, b) if a <= b else (b, a)
+        if key in seen:
+            continue
+        seen.add(key)
+        segments.append([a, b])
+
+    merged = True
+    while merged:
+        merged = False
+        # which segments end at every point
+        ends: dict[tuple[float, float], list[int]] = {}
+        for i, (a, b) in enumerate(segments):
+            ends.setdefault(a, []).append(i)
+            ends.setdefault(b, []).append(i)
+        removed = set()
+        for point, users in ends.items():
+            if len(users) != 2 or users[0] in removed or users[1] in removed:
+                continue
+            i, j = users
+            # the far ends of both segments
+            far_i = segments[i][0] if segments[i][1] == point else segments[i][1]
+            far_j = segments[j][0] if segments[j][1] == point else segments[j][1]
+            if far_i == far_j or point_line_distance(point, far_i, far_j) > tolerance:
+                continue
+            # the shared point has to lie between the far ends, not fold back over them
+            if (point[0] - far_i[0]) * (far_j[0] - point[0]) + (point[1] - far_i[1]) * (far_j[1] - point[1]) <= 0:
+                continue
+            # keep the direction of the first segment
+            segments[i] = [far_i, far_j] if segments[i][1] == point else [far_j, far_i]
+            removed.add(j)
+            merged = True
+        segments = [s for k, s in enumerate(segments) if k not in removed]
+
+    return [[a[0], a[1], b[0], b[1]] for a, b in segments]
+
+def file_hash(file: str) -> bytes:
+    with open(file, "rb") as f:
+        return hashlib.sha1(f.read()).digest()
+
+def save_walls_bin(file: str, walls: list[list[float]], source_hash: bytes = bytes(20)):
+    data = np.asarray(walls, dtype=SEGMENT_DTYPE).reshape(-1, 4)
+    with open(file, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(data), source_hash))
+        f.write(data.tobytes())
+
+def walls_bin_source(file: str) -> bytes:
+    """ The hash of the json file the binary file was compiled from, None if it isn't a current wall file """
+    with open(file, "rb") as f:
+        magic, version, count, source_hash = HEADER.unpack(f.read(HEADER.size))
+    if magic != MAGIC or version != VERSION:
+        return None
+    return source_hash
+
+def load_walls_bin(file: str) -> np.ndarray:
+    """ The walls as a read only (n, 4) float32 array mapped straight from the file """
+    with open(file, "rb") as f:
+        magic, version, count, source_hash = HEADER.unpack(f.read(HEADER.size))
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("%s is not a version %d wall file" % (file, VERSION))
+    if count == 0:
+        return np.zeros((0, 4), dtype=SEGMENT_DTYPE)
+    return np.memmap(file, dtype=SEGMENT_DTYPE, mode="r", offset=HEADER.size, shape=(count, 4))
+
+def compile_walls(res_dir: str = "res") -> tuple[int, int]:
+    """ Merge the walls from the json file and write them to the binary file. Returns the segment count before and after """
+    json_file = os.path.join(res_dir, WALLS_JSON)
+    walls = load_walls(json_file)
+    merged = merge_walls(walls)
+    save_walls_bin(os.path.join(res_dir, WALLS_BIN), merged, file_hash(json_file))
+    return len(walls), len(merged)
+
+def load_level_walls(res_dir: str = "res") -> list[list[float]]:
+    """
+    The merged walls of the level, from walls.bin if it was compiled from the current walls.json.
+    Otherwise the json is merged here, rounded like the binary file, so a replay sees the same walls either way.
+    """
+    json_file = os.path.join(res_dir, WALLS_JSON)
+    bin_file = os.path.join(res_dir, WALLS_BIN)
+    if os.path.exists(bin_file) and (not os.path.exists(json_file) or walls_bin_source(bin_file) == file_hash(json_file)):
+        # the world needs a list it can change
+        return load_walls_bin(bin_file).tolist()
+    return np.asarray(merge_walls(load_walls(json_file)), dtype=SEGMENT_DTYPE).reshape(-1, 4).tolist()
+
+if __name__ == "__main__":
+    before, after = compile_walls()
+    print("%d walls, %d after merging" % (before, after))
@@ -0,0 +1,89 @@
+import random
+
+import numpy as np
+import pyray as pr
+
+import sprite_batch as sprites
+
+# the waterline repeats every WATER_TILES tiles
+WATER_TILES = 20
+WATER_FRAMES = 3
+# size of one frame in water.png, tiles are drawn at twice that size
+TILE_WIDTH = 32
+TILE_HEIGHT = 16
+TILE_SCALE = 2
+# every tile advances one frame every MIN_PERIOD to MAX_PERIOD ticks.
+# the tiles used to advance with a 1% chance per tick, so about every 100 ticks
+MIN_PERIOD = 60
+MAX_PERIOD = 140
+WATER_SEED = 7
+
+class WaterStrip():
+    """
+    The animated waterline. The frame of every tile is a function of the tick, each tile has its
+    own fixed period and phase, so the tiles still change one at a time without rolling dice.
+
+    The WATER_TILES tiles are baked into one render texture, which is only redrawn when a tile changes.
+    The visible waterline is then a single draw of that texture, repeating it along the x axis.
+    """
+    periods: np.ndarray
+    offsets: np.ndarray
+    baked: np.ndarray
+    target: pr.RenderTexture2D
+
+    def __init__(self, tiles: int = WATER_TILES, seed: int = WATER_SEED):
+        rng = random.Random(seed)
+        self.periods = np.array([rng.randint(MIN_PERIOD, MAX_PERIOD) for _ in range(tiles)])
+        self.offsets = np.array([rng.randrange(period * WATER_FRAMES) for period in self.periods.tolist()])
+        self.baked = np.full(tiles, -1)
+        self.target = None
+
+    @property
+    def tiles(self) -> int:
+        return len(self.periods)
+
+    def frames(self, tick: int) -> np.ndarray:
+        """ The animation frame of every tile at the given tick """
+        return (tick + self.offsets) // self.periods % WATER_FRAMES
+
+    def bake(self, texture, tick: int):
+        """ Redraw the strip if any tile changed. Must be called outside of begin_mode_2d """
+        frames = self.frames(tick)
+        if self.target is not None and np.array_equal(frames, self.baked):
+            return
+        if self.target is None:
+            self.target = pr.load_render_texture(self.tiles * TILE_WIDTH, TILE_HEIGHT)
+            pr.set_texture_wrap(self.target.texture, pr.TEXTURE_WRAP_REPEAT)
+
+        # the water has transparent pixels, so the whole strip is cleared and redrawn
+        pr.begin_texture_mode(self.target)
+        pr.clear_background(pr.BLANK)
+        for i, frame in enumerate(frames.tolist()):
+            sprites.draw_texture_pro(texture,
+                (TILE_WIDTH * frame, 0, TILE_WIDTH, TILE_HEIGHT),
+                (i * TILE_WIDTH, 0, TILE_WIDTH, TILE_HEIGHT),
+                (0, 0),
+                0,
+                pr.WHITE
+            )
+        pr.end_texture_mode()
+        self.baked = frames
+
+    def draw(self, first_tile: int, count: int, layer: int):
+        """ Draw count tiles of the waterline, starting at the tile with the given world index """
+        tile_w = TILE_WIDTH * TILE_SCALE
+        tile_h = TILE_HEIGHT * TILE_SCALE
+        # render textures are stored upside down
+        sprites.draw_texture_pro(self.target.texture,
+            ((first_tile % self.tiles) * TILE_WIDTH, 0, count * TILE_WIDTH, -TILE_HEIGHT),
+            (first_tile * tile_w, 8, count * tile_w, tile_h),
+            (16, 16),
+            0,
+            pr.WHITE,
+            layer=layer
+        )
+
+    def unload(self):
+        if self.target is not None:
+            pr.unload_render_texture(self.target)
+            self.target = None
@@ -0,0 +1,682 @@
+import os
+import json
+import math
+import random
+import struct
+import time
+
+import pyray as pr
+import pymunk as pm
+from pymunk.vec2d import Vec2d as Vec2
+
+from squid import Squid, TENTACLE_STIFFNESS, DEFAULT_DAMPING, DEFAULT_POSE, PRE_PUSH_POSE, BALANCE_POSE
+from ship import Ship
+from fish import Fish
+from buoyancy import BuoyancySystem
+from dormancy import Dormancy
+from perception import Perception
+from lifecycle import Lifecycle
+from human import Human
+from particles import ParticleSystem
+from text_cache import TextCache
+from water import WaterStrip
+from level_chunks import LevelChunks
+from profiler import FrameProfiler
+from governor import PhysicsGovernor
+from spawn_zones import SpawnMap, FishDensity
+from ship_chunks import ShipChunks, ship_layout
+from animation import AnimationTable
+import sprite_batch as sprites
+from sprite_batch import SpriteBatch, LAYER_BACKGROUND, LAYER_WATER
+
+WALL_CATEGORY = 0b10
+
+MAX_PUSH_BUILDUP = 1.0
+FISH_SPAWN_COOLDOWN_MAX = 2.0
+# fish spawn ahead of the squid, between these distances and at most FISH_SPAWN_SPREAD radians off its heading
+FISH_SPAWN_NEAR = 300
+FISH_SPAWN_FAR = 600
+FISH_SPAWN_SPREAD = 0.25
+# free cells that are tried before giving up, when the first one has a body in it
+FISH_SPAWN_TRIES = 3
+# the fish density grid is recounted this often, in between only spawns are added to it
+FISH_RECOUNT_TICKS = 30
+
+# how the squid moves, sweep.py tries other values for these
+TURN_SPEED = 1.5
+MAX_SPEED = 350
+PUSH_FORCE = 2000
+# drag along the squid's facing, across it, and on its spin
+WATER_DRAG = 0.2
+SIDE_DRAG = 5
+SPIN_DRAG = 5
+
+# the simulation always advances in ticks of PHYSICS_DT, each split into PHYSICS_SUBSTEPS space steps
+PHYSICS_DT = 1 / 60
+PHYSICS_SUBSTEPS = 1
+# after a long hitch we only catch up this many ticks, the rest of the time is dropped
+MAX_TICKS_PER_STEP = 5
+
+# bodies have to be idle this long before pymunk puts them to sleep on its own
+SLEEP_TIME_THRESHOLD = 1.0
+
+# the most particles alive at once - a feeding frenzy won't come close
+MAX_BLOOD_PARTICLES = 1024
+MAX_POINT_PARTICLES = 256
+
+# sprites can be a bit bigger than the bodies they are drawn for, so the view is grown by this much when culling
+CULL_MARGIN = 32
+
+class RLDrawOptions(pm.SpaceDebugDrawOptions):
+    """ A class that implements the pymunk debug draw options interface for pyray """
+    def __init__(self):
+        super().__init__()
+
+    def draw_circle(self, pos, angle, radius, outline_color, fill_color):
+        col = pr.Color(int(fill_color.r), int(fill_color.g), int(fill_color.b), int(fill_color.a))
+        pr.draw_circle(int(pos.x), int(pos.y), radius, col)
+        line_end = Vec2(radius, 0).rotated(angle) + pos
+        pr.draw_line(int(pos.x), int(pos.y), int(line_end.x), int(line_end.y), col)
+
+    def draw_segment(self, a, b, color):
+        col = pr.Color(int(color.r), int(color.g), int(color.b), int(color.a))
+        pr.draw_line(int(a.x), int(a.y), int(b.x), int(b.y), col)
+
+    def draw_fat_segment(self, a, b, radius, outline_color, fill_color):
+        col = pr.Color(int(fill_color.r), int(fill_color.g), int(fill_color.b), int(fill_color.a))
+        pr.draw_line(int(a.x), int(a.y), int(b.x), int(b.y), col)
+
+    def draw_polygon(self, verts, radius, outline_color, fill_color):
+        col = pr.Color(int(fill_color.r), int(fill_color.g), int(fill_color.b), int(fill_color.a))
+        for i in range(len(verts) - 1):
+            pr.draw_line(int(verts[i].x), int(verts[i].y), int(verts[i+1].x), int(verts[i+1].y), col)
+        pr.draw_line(int(verts[-1].x), int(verts[-1].y), int(verts[0].x), int(verts[0].y), col)
+
+    def draw_dot(self, size, pos, color):
+        col = pr.Color(int(color.r), int(color.g), int(color.b), int(color.a))
+        pr.draw_circle(int(pos.x), int(pos.y), size, col)
+
+class TextureInfo():
+    """ Stands in for a pr.Texture2D when running without a window - only the size is known """
+    id: int
+    width: int
+    height: int
+
+    def __init__(self, width: int, height: int):
+        # no texture was uploaded to the gpu
+        self.id = 0
+        self.width = width
+        self.height = height
+
+def png_size(file: str) -> tuple[int, int]:
+    """ Read the size of a png image from its header, without decoding it """
+    with open(file, "rb") as f:
+        header = f.read(24)
+    return struct.unpack(">II", header[16:24])
+
+TEXTURE_FILES = {
+    "main_menu_bg": "menu.png",
+    "controls_screen": "controls.png",
+    "level": "level.png",
+    "squid_body": "squid-body.png",
+    "squid_tentacle": "squid-tentacle.png",
+    "squid_ltentacle": "squid-ltentacle.png",
+    "guy1": "guy1.png",
+    "guy2": "guy2.png",
+    "boat": "boat.png",
+    "water": "water.png",
+    "fish": "fish.png",
+}
+
+ANIMATION_FILES = {
+    "guy2": "guy2.json",
+    "water": "water.json",
+    "fish": "fish.json",
+}
+
+def load_animations(res_dir: str = "res") -> dict[str, AnimationTable]:
+    """ Load and compile the animation json files """
+    animations = {}
+    for name, file in ANIMATION_FILES.items():
+        with open(os.path.join(res_dir, file), "r") as f:
+            animations[name] = AnimationTable(json.load(f))
+    return animations
+
+def load_headless_game_data(res_dir: str = "res") -> dict:
+    """
+    Build the game data without a window or GPU.
+    Textures are replaced by TextureInfo objects, which is all the simulation needs.
+    """
+    return {
+        "textures": {name: TextureInfo(*png_size(os.path.join(res_dir, file))) for name, file in TEXTURE_FILES.items()},
+        "animations": load_animations(res_dir),
+    }
+
+class Inputs():
+    """ Everything the simulation reads from the player in a single step """
+    mouse_pos: Vec2
+    left_down: bool
+    right_down: bool
+    spawn_fish: bool
+
+    def __init__(self, mouse_pos: Vec2 = Vec2(0, 0), left_down: bool = False, right_down: bool = False, spawn_fish: bool = False):
+        self.mouse_pos = mouse_pos
+        self.left_down = left_down
+        self.right_down = right_down
+        self.spawn_fish = spawn_fish
+
+class MovementParams():
+    """ The tunable constants of the squid's movement """
+    turn_speed: float
+    max_speed: float
+    push_force: float
+    water_drag: float
+    side_drag: float
+    spin_drag: float
+    tentacle_stiffness: float
+    tentacle_damping: float
+
+    def __init__(self, turn_speed: float = TURN_SPEED, max_speed: float = MAX_SPEED, push_force: float = PUSH_FORCE,
+                 water_drag: float = WATER_DRAG, side_drag: float = SIDE_DRAG, spin_drag: float = SPIN_DRAG,
+                 tentacle_stiffness: float = TENTACLE_STIFFNESS, tentacle_damping: float = DEFAULT_DAMPING):
+        self.turn_speed = turn_speed
+        self.max_speed = max_speed
+        self.push_force = push_force
+        self.water_drag = water_drag
+        self.side_drag = side_drag
+        self.spin_drag = spin_drag
+        self.tentacle_stiffness = tentacle_stiffness
+        self.tentacle_damping = tentacle_damping
+
+class World():
+    """
+    The whole game simulation - physics space, squid, ships, fish, particles and score.
+    step() never touches the window, so a world can run without one.
+    render() draws the world through the given camera.
+    """
+    game_data: dict
+    movement: MovementParams
+    space: pm.Space
+    buoyancy: BuoyancySystem
+    dormancy: Dormancy
+    perception: Perception
+    lifecycle: Lifecycle
+    sprite_batch: SpriteBatch
+    squid: Squid
+    game_objects: list
+    walls: list[list[float]]
+    level_rect: tuple[float, float, float, float]
+    # the level background streamed in chunks, if the game data has it
+    level_chunks: LevelChunks
+
+    push_buildup: float
+    good_push: bool
+    fish_spawn_cooldown: float
+    # creates the ships near the squid and saves the ones it left behind
+    ship_chunks: ShipChunks
+    # where fish can spawn, worked out from the walls when the world is created
+    spawn_map: SpawnMap
+    fish_density: FishDensity
+    water: WaterStrip
+    blood_particles: ParticleSystem
+    point_particles: ParticleSystem
+    # the point numbers are rasterised once per value
+    text_cache: TextCache
+    point_total: int
+    mouse_pos: Vec2
+    # how many game objects the last render() drew and how many it skipped because they were off screen
+    drawn_objects: int
+    culled_objects: int
+
+    fixed_dt: float
+    substeps: int
+    max_ticks: int
+    accumulator: float
+    # number of ticks run so far
+    tick_count: int
+    # times the phases of the ticks, main shares it with the rest of the frame
+    profiler: FrameProfiler
+    # adapts the physics quality to the machine, off unless enable_governor() is called
+    governor: PhysicsGovernor
+    pending_spawn: bool
+    prev_transforms: dict[pm.Body, tuple[Vec2, float]]
+
+    def __init__(self, game_data: dict, walls: list[list[float]],
+                 fixed_dt: float = PHYSICS_DT, substeps: int = PHYSICS_SUBSTEPS, max_ticks: int = MAX_TICKS_PER_STEP,
+                 movement: MovementParams = None):
+        self.game_data = game_data
+        self.movement = movement if movement is not None else MovementParams()
+        self.fixed_dt = fixed_dt
+        self.substeps = substeps
+        self.max_ticks = max_ticks
+        self.accumulator = 0.0
+        self.tick_count = 0
+        self.profiler = FrameProfiler()
+        self.governor = None
+        self.pending_spawn = False
+        self.prev_transforms = {}
+        self.sprite_batch = SpriteBatch()
+        self.level_rect = (0, -380, game_data["textures"]["level"].width, game_data["textures"]["level"].height)
+        self.level_chunks = game_data.get("level_chunks")
+        if self.level_chunks is not None:
+            self.level_chunks.origin = Vec2(self.level_rect[0], self.level_rect[1])
+
+        # Setup physics
+        self.space = pm.Space()
+        self.space.gravity = (0, 0)
+        # space.damping = 0.01
+        self.buoyancy = BuoyancySystem()
+        # sleeping has to be enabled for dormant objects to be put to sleep
+        self.space.sleep_time_threshold = SLEEP_TIME_THRESHOLD
+        self.dormancy = Dormancy()
+        self.perception = Perception()
+        self.lifecycle = Lifecycle(self.space, game_data, self.buoyancy, self.dormancy)
+
+        # Create the squid
+        self.squid = Squid(game_data, Vec2(300, 100), self.space,
+                           self.movement.tentacle_stiffness, self.movement.tentacle_damping)
+
+        # Create the level
+        self.walls = walls
+        #add all the walls to the physics space
+        for wall in walls:
+            shape = pm.Segment(self.space.static_body, (wall[0], wall[1]), (wall[2], wall[3]), 0)
+            shape.friction = 0.1
+            shape.filter = pm.ShapeFilter(categories=WALL_CATEGORY)
+            self.space.add(shape)
+
+        # setup gameplay variables
+        self.push_buildup = 0.0
+        self.good_push = False
+
+        self.game_objects = [self.squid]
+
+        # spawn boats, only the ones near the squid are in the space at a time
+        self.ship_chunks = ShipChunks(self.space, game_data, self.buoyancy, self.dormancy, self.lifecycle,
+                                      ship_layout(self.squid.body.position + Vec2(30, -100)))
+        self.ship_chunks.update(self.squid.body.position.x, self.game_objects, self.squid.caught)
+
+        self.water = WaterStrip()
+
+        self.fish_spawn_cooldown = 0.0
+        self.spawn_map = SpawnMap(walls, self.level_rect, self.squid.body.position)
+        self.fish_density = FishDensity(self.level_rect)
+
+        self.blood_particles = ParticleSystem(MAX_BLOOD_PARTICLES, drag=1, gravity=(0, 10))
+        # point particles only drift down at a constant speed
+        self.point_particles = ParticleSystem(MAX_POINT_PARTICLES)
+        self.text_cache = TextCache()
+
+        self.point_total = 0
+        self.mouse_pos = Vec2(0, 0)
+        self.drawn_objects = 0
+        self.culled_objects = 0
+
+    def step(self, dt: float, inputs: Inputs) -> int:
+        """
+        Advance the simulation by dt seconds using the given player inputs.
+        The time is consumed in fixed ticks, so a long frame never turns into one huge physics step.
+        Returns the number of ticks that were run.
+        """
+        self.mouse_pos = inputs.mouse_pos
+        # key presses only last one frame, so remember them until a tick can consume them
+        self.pending_spawn = self.pending_spawn or inputs.spawn_fish
+
+        self.accumulator += dt
+        ticks = 0
+        while self.accumulator >= self.fixed_dt:
+            if ticks >= self.max_ticks:
+                # we're too far behind - drop the time instead of spiralling
+                self.accumulator = 0.0
+                break
+            self.accumulator -= self.fixed_dt
+            self.save_transforms()
+            self.tick(self.fixed_dt, inputs)
+            ticks += 1
+        return ticks
+
+    def tick(self, dt: float, inputs: Inputs):
+        """ Run a single fixed step of the simulation """
+        inputs = Inputs(inputs.mouse_pos, inputs.left_down, inputs.right_down, self.pending_spawn)
+        self.pending_spawn = False
+        self.tick_count += 1
+
+        # bring in the ships the squid approaches, save the ones it left, and
+        # freeze what is far from the squid and wake what it approaches
+        self.ship_chunks.update(self.squid.body.position.x, self.game_objects, self.squid.caught)
+        self.dormancy.update(self.squid.body.position, self.game_objects)
+        # fish are only spawned around the squid, so the ones it left behind go back to the pool
+        for obj in [obj for obj in self.game_objects if isinstance(obj, Fish) and self.dormancy.is_dormant(obj)]:
+            self.lifecycle.despawn(obj, self.game_objects)
+        if self.tick_count % FISH_RECOUNT_TICKS == 0:
+            self.fish_density.recount([obj.body.position for obj in self.game_objects if isinstance(obj, Fish)])
+        self.profiler.lap("gameplay")
+
+        self.control_squid(dt, inputs)
+        self.profiler.lap("squid")
+        self.check_eating()
+        self.profiler.lap("gameplay")
+
+        if not inputs.left_down and inputs.right_down:
+            self.squid.reach(inputs.mouse_pos)
+        self.profiler.lap("squid")
+
+        # Update the physics
+        start = time.perf_counter()
+        self.step_physics(dt)
+        if self.governor is not None and self.governor.update(time.perf_counter() - start, self.tick_count):
+            self.substeps = self.governor.substeps
+            self.space.iterations = self.governor.iterations
+        self.profiler.lap("physics")
+        self.buoyancy.update()
+        self.profiler.lap("buoyancy")
+        self.perception.update(self.get_observers(), self.squid.get_shapes())
+        self.profiler.lap("perception")
+
+        # Update the game objects, the squid is always the first one
+        self.squid.update(dt)
+        self.profiler.lap("squid")
+        for obj in self.game_objects[1:]:
+            if not self.dormancy.is_dormant(obj):
+                obj.update(dt)
+        self.profiler.lap("objects")
+
+        self.update_particles(dt)
+        self.profiler.lap("particles")
+
+    def enable_governor(self, **settings):
+        """
+        Let the physics quality adapt to how long the steps take, starting from the current settings.
+        The budget and the bounds of the substeps and iterations can be given like for PhysicsGovernor
+        """
+        self.governor = PhysicsGovernor(self.space, self.substeps, **settings)
+
+    def get_observers(self) -> list:
+        """ The npcs that will look for the squid this tick """
+        observers = []
+        for obj in self.game_objects:
+            if self.dormancy.is_dormant(obj):
+                continue
+            if isinstance(obj, Ship):
+                observers.extend(human for human in obj.humans if human.state != "eaten")
+            elif isinstance(obj, Fish) and obj.state != "eaten":
+                observers.append(obj)
+        return observers
+
+    def step_physics(self, dt: float):
+        if self.substeps <= 1:
+            self.space.step(dt)
+            return
+        # chipmunk clears forces after every step, but the game applies them once per tick,
+        # so they have to be reapplied for each substep
+        forces = [(b, b.force, b.torque) for b in self.space.bodies]
+        sub_dt = dt / self.substeps
+        for i in range(self.substeps):
+            if i > 0:
+                for b, force, torque in forces:
+                    b.force = force
+                    b.torque = torque
+            self.space.step(sub_dt)
+
+    def save_transforms(self):
+        """ Remember where every body was before a tick, so rendering can interpolate between ticks """
+        self.prev_transforms = {b: (b.position, b.angle) for b in self.space.bodies}
+
+    @property
+    def alpha(self) -> float:
+        """ How far we are between the last tick and the next one """
+        return min(self.accumulator / self.fixed_dt, 1.0)
+
+    def render_transform(self, body: pm.Body) -> tuple[Vec2, float]:
+        """ The position and angle of the body interpolated for the current frame """
+        prev = self.prev_transforms.get(body)
+        if prev is None:
+            return body.position, body.angle
+        alpha = self.alpha
+        prev_pos, prev_angle = prev
+        return prev_pos.interpolate_to(body.position, alpha), prev_angle + (body.angle - prev_angle) * alpha
+
+    def render_position(self, body: pm.Body) -> Vec2:
+        """ The position of the body interpolated for the current frame """
+        return self.render_transform(body)[0]
+
+    def control_squid(self, dt: float, inputs: Inputs):
+        """ Squid movement and fish spawning ahead of it """
+        squid = self.squid
+        mouse_pos = inputs.mouse_pos
+        in_water = squid.body.position.y > 0
+
+        movement = self.movement
+        turn_speed = movement.turn_speed
+        max_speed = movement.max_speed
+
+        squid_dir = Vec2(0, 1).rotated(squid.body.angle)
+        mouse_dir = mouse_pos - squid.body.position
+        mouse_dir = Vec2(mouse_dir.x, mouse_dir.y).normalized()
+        angle_diff = -mouse_dir.get_angle_between(-squid_dir)
+        mouse_dist = mouse_pos.get_distance(squid.body.position)
+        vel_len = squid.body.velocity.length
+        vel_dir = Vec2(squid.body.velocity.x, squid.body.velocity.y).normalized()
+
+        scl_angle_diff = (min(abs(angle_diff)*10, 1) * (angle_diff / abs(angle_diff))) if angle_diff != 0 else 0
+
+        if in_water:
+            # turn_speed *= 1 - 0.6 * min(vel_len / 100, 1)
+
+            # slow down the squid in the direction perpendicular to its facing
+            perp = Vec2(-squid_dir.y, squid_dir.x)
+            squid.body.velocity -= perp * squid.body.velocity.dot(perp) * dt * movement.side_drag
+
+            squid.body.velocity *= 1 - dt*movement.water_drag*math.sqrt(max(vel_len, 10)/200)
+
+            # slow down the spin if we are close to the mouse and moving quickly
+            squid.body.angular_velocity *= 1 - max(0.8 - (angle_diff*angle_diff)/2*2, 0)*dt*3 * min(vel_len/50, 1)
+
+            # if we're moving quickly, there'll be an aerodynamic correction force,
+            # which will try too keep us facing the direction of movement
+            ang_err = -vel_dir.get_angle_between(-squid_dir)
+            squid.body.angular_velocity += ang_err * dt * 15 * min(vel_len/100, 1)
+
+            squid.body.angular_velocity *= 1-dt*movement.spin_drag
+
+        if inputs.left_down:
+            if self.good_push:
+                self.good_push = False
+                self.push_buildup = min(self.push_buildup, MAX_PUSH_BUILDUP/4)
+            squid.set_pose(PRE_PUSH_POSE)
+            self.push_buildup = min(self.push_buildup + dt/2, MAX_PUSH_BUILDUP)
+            squid.body.angular_velocity += turn_speed * vel_len * 0.001 * scl_angle_diff
+            if squid.body.angular_velocity * angle_diff < 0: # they have different signs
+                squid.body.angular_velocity *= 1-(dt*5)
+
+            if inputs.right_down:
+                turn_speed *= 12.0
+                squid.set_pose(BALANCE_POSE)
+
+            squid.body.angular_velocity += turn_speed * scl_angle_diff/50
+            # slow down the squid if it is moving backwards relative to its body
+            if squid_dir.dot(vel_dir) > 0.2:
+                squid.body.velocity *= 0.9
+
+        else:
+            # if we bulid enough push, we do a 'good push'
+            if not self.good_push and self.push_buildup > 0.1:
+                # add more push the more the squid's tantacles are facing away from the center
+                self.push_buildup += squid.get_spread() * 0.08
+                self.good_push = True
+                if inputs.right_down:
+                    # we can prevent the push by holding the right mouse button
+                    self.push_buildup = 0.0
+                    self.good_push = False
+                    # since this also acts as a break, we also slow down the squid
+                    squid.body.velocity *= 0.75
+                    squid.body.angular_velocity *= 0.75
+
+
+            # good push - push the squid in the direction it is facing while adding
+            # angular velocity to the squid to make it look at the mouse
+            if self.good_push:
+                self.push_buildup = max(self.push_buildup - dt * max(vel_len/(0.5*max_speed), 1) / 2, 0.0)
+                # apply angular velocity to the squid
+                squid.body.angular_velocity += turn_speed * scl_angle_diff * self.push_buildup / 30
+                if squid.body.angular_velocity * angle_diff < 0: # they have different signs
+                    squid.body.angular_velocity *= 1-(dt*20)
+                squid.set_pose(DEFAULT_POSE)
+                # apply force to the squid
+                force = self.push_buildup * movement.push_force * min(mouse_dist / 50.0, 1.0) * (1 - (min(vel_len/max_speed, 1)))
+                squid.body_tip.apply_force_at_local_point(Vec2(0, -1) * force, (0, -50))
+                # squid.body.velocity += -squid_dir * push_buildup * 100 * min(mouse_dist, 50.0) / 50.0 * dt
+
+                if self.push_buildup == 0.0:
+                    self.good_push = False
+
+
+            else:
+                # neutral
+                squid.body.angular_velocity *= 1-(dt*0.5)
+                self.push_buildup = max(self.push_buildup - dt, 0.0)
+                self.good_push = False
+                squid.set_pose(DEFAULT_POSE)
+
+        self.fish_spawn_cooldown -= dt
+
+        if vel_len > 10:
+            # spawn some fish
+            if (random.random() < 0.01 and self.fish_spawn_cooldown <= 0.0) or inputs.spawn_fish:
+                self.try_spawn_fish(vel_dir)
+
+    def try_spawn_fish(self, direction: Vec2):
+        """ Spawn a fish somewhere ahead of the squid in the given direction, if there is room """
+        # the spawn map only offers cells in open water that aren't crowded with fish,
+        # the bodies (ships, humans, the squid, other fish) are the only thing left to check
+        cells = self.spawn_map.cells_in_cone(self.squid.body.position, direction, FISH_SPAWN_NEAR, FISH_SPAWN_FAR,
+                                             FISH_SPAWN_SPREAD, self.fish_density)
+        if len(cells) == 0:
+            return
+        no_walls = pm.ShapeFilter(mask=pm.ShapeFilter.ALL_MASKS() ^ WALL_CATEGORY)
+        for _ in range(FISH_SPAWN_TRIES):
+            spawn_pos = self.spawn_map.spawn_position(int(cells[random.randrange(len(cells))]))
+            if not self.space.bb_query(pm.BB(spawn_pos.x-10, spawn_pos.y-10, spawn_pos.x+10, spawn_pos.y+10), no_walls):
+                fish = self.lifecycle.spawn_fish(spawn_pos)
+                self.game_objects.append(fish)
+                self.fish_density.add(spawn_pos)
+                self.fish_spawn_cooldown = FISH_SPAWN_COOLDOWN_MAX
+                return
+
+    def check_eating(self):
+        """ Check if the squid is eating something """
+        squid = self.squid
+        for i, tnt in enumerate([lt[-1][0] for lt in squid.ltentacles]):
+            if squid.caught[i] is not None:
+                if squid.caught[i].body.game_object.state == "eaten":
+                    squid.caught[i] = None
+                    continue
+                if (squid.caught[i].body.position - squid.body.position).length < 14:
+                    squid.caught[i].body.game_object.state = "eaten"
+                    self.remove_object(squid.caught[i].body.game_object)
+                    points = 50 if isinstance(squid.caught[i].body.game_object, Fish) else 100
+                    self.emit_eat_effects(tnt.position, points)
+                    self.point_total += points
+                    squid.caught[i] = None
+
+    def remove_object(self, obj):
+        """ Take a fish or a human out of the world for good """
+        if isinstance(obj, Human):
+            for ship in self.game_objects:
+                if isinstance(ship, Ship) and obj in ship.humans:
+                    self.lifecycle.despawn(obj, ship.humans)
+        else:
+            self.lifecycle.despawn(obj, self.game_objects)
+
+    def emit_eat_effects(self, position: Vec2, points: int):
+        """ A splash of blood and the points floating up where something was eaten """
+        # between 3 and 5 blood particles with random velocity
+        velocities = []
+        lives = []
+        for _ in range(random.randint(3, 5)):
+            velocities.append((random.random() * 20 - 10, random.random() * 20 - 10))
+            lives.append(random.random() * 0.3 + 0.5)
+        self.blood_particles.emit_many(position, velocities, lives)
+        self.point_particles.emit(position - Vec2(0, 20), Vec2(0, 50), random.random() * 0.1 + 0.5, points)
+
+    def update_particles(self, dt: float):
+        self.blood_particles.update(dt)
+        self.point_particles.update(dt)
+
+    def view_bb(self, camera: pr.Camera2D, margin: float = CULL_MARGIN) -> pm.BB:
+        """
+        The part of the world the camera sees, grown by the margin.
+        The main loop centers the camera offset on the screen, so the screen is twice the offset.
+        """
+        half_w = camera.offset.x / camera.zoom + margin
+        half_h = camera.offset.y / camera.zoom + margin
+        return pm.BB(camera.target.x - half_w, camera.target.y - half_h, camera.target.x + half_w, camera.target.y + half_h)
+
+    def render(self, camera: pr.Camera2D, draw_collision: bool = False, draw_walls: list[list[float]] = None):
+        """
+        Draw the world through the given camera. Must be called between begin_drawing and end_drawing.
+        draw_walls are drawn over everything, for the wall editor.
+        """
+        # the objects are drawn at their interpolated transforms. the bodies themselves are never touched,
+        # setting a position wakes a body and doesn't round trip exactly, so drawing would change the simulation
+
+        # text and water have to be rasterised before the camera is set up
+        self.water.bake(self.game_data["textures"]["water"], self.tick_count)
+        points = self.point_particles
+        point_values = points.value[:points.count].tolist()
+        for value in set(point_values):
+            self.text_cache.prepare(str(value), 20, pr.WHITE, pr.BLACK)
+
+        pr.begin_mode_2d(camera)
+        sprites.begin(self.sprite_batch)
+
+        # Draw the level
+        view = self.view_bb(camera)
+        if self.level_chunks is not None:
+            self.level_chunks.update(view)
+            self.level_chunks.draw(view, LAYER_BACKGROUND)
+        else:
+            level = self.game_data["textures"]["level"]
+            sprites.draw_texture_pro(level,
+                (0, 0, level.width, level.height),
+                (0, self.level_rect[1], level.width * 2, level.height * 2),
+                (0, 0),
+                0,
+                pr.WHITE,
+                layer=LAYER_BACKGROUND
+            )
+
+        # only draw what the camera can see - the squid is always on screen
+        self.drawn_objects = 0
+        self.culled_objects = 0
+        for obj in self.game_objects:
+            if obj is self.squid or view.intersects(obj.get_bb()):
+                obj.draw(self.mouse_pos, self.render_transform)
+                self.drawn_objects += 1
+            else:
+                self.culled_objects += 1
+
+        # draw the water
+        self.water.draw(int(self.squid.body.position.x/64) - 10, 20, LAYER_WATER)
+
+        sprites.end()
+
+        # draw blood particles as 4x4 squares
+        blood = self.blood_particles
+        for x, y in blood.position[:blood.count].astype(int).tolist():
+            pr.draw_rectangle(x, y, 4, 4, pr.RED)
+
+        # draw point particles as text
+        for (x, y), value in zip(points.position[:points.count].astype(int).tolist(), point_values):
+            self.text_cache.draw(str(value), x, y, 20, pr.WHITE, pr.BLACK)
+
+        if draw_collision:
+            draw_options = RLDrawOptions()
+            draw_options.shape_dynamic_color = (0, 0, 0, 255)
+            self.space.debug_draw(draw_options)
+
+        if draw_walls is not None:
+            for wall in draw_walls:
+                pr.draw_line(int(wall[0]), int(wall[1]), int(wall[2]), int(wall[3]), pr.RED)
+
+        pr.end_mode_2d()